@@ -0,0 +1,93 @@
+from typing import Sequence
+try:
+    from .Genetic import TRAY_MUTATION, ADD_ELEMENT, REMOVE_ELEMENT, NO_MUTATION
+except:
+    from Genetic import TRAY_MUTATION, ADD_ELEMENT, REMOVE_ELEMENT, NO_MUTATION
+
+# Rates of the mutation operators of a Genetic, children are left unmutated with the remaining probability
+RATES = {
+    TRAY_MUTATION: 'mutation_rate',
+    ADD_ELEMENT: 'mutation_rate_number_of_elements_up',
+    REMOVE_ELEMENT: 'mutation_rate_number_of_elements_down',
+}
+OPERATORS = tuple(RATES) + (NO_MUTATION,)
+
+class OperatorAdaptation:
+    # Adapts the operators of a Genetic to their success, a child is a success when it is fitter than the better
+    # of its parents. After every generation:
+    # - the rate of each mutation operator moves towards its share of the successes, every operator keeps at least
+    #   min_share of the summed rates so it is still tried, the sum of the rates stays as configured
+    # - the mutation step follows a success rule like the 1/5 rule of evolution strategies, it grows when more
+    #   than target_success of the tray mutations succeed and shrinks otherwise. Children of a converging population
+    #   rarely beat their parents, so the target is far below 1/5
+    # - the extrapolation of the crossover range follows the same rule on all children
+    # Success rates are averaged over the generations with the weight learning_rate for the latest
+    def __init__(self, learning_rate: float = 0.2, min_share: float = 0.1, target_success: float = 0.05,
+                 step_factor: float = 1.2, max_step: int = 50, max_extrapolation: float = 0.5) -> None:
+        self.learning_rate = learning_rate
+        self.min_share = min_share
+        self.target_success = target_success
+        self.step_factor = step_factor
+        self.max_step = max_step
+        self.max_extrapolation = max_extrapolation
+        self.success = {operator: None for operator in OPERATORS}
+        self.step: float = None
+        self.extrapolation: float = None
+
+    def update(self, genetic, operators: Sequence[int], improved: Sequence[bool]) -> None:
+        if len(operators) == 0:
+            return
+        if self.step is None:
+            self.step = float(genetic.mutation_step)
+            self.extrapolation = -genetic.alpha_range[0]
+        trials = {operator: 0 for operator in OPERATORS}
+        successes = {operator: 0 for operator in OPERATORS}
+        for operator, success in zip(operators, improved):
+            if operator in trials:
+                trials[operator] += 1
+                successes[operator] += success
+        for operator in OPERATORS:
+            if trials[operator] > 0:
+                rate = successes[operator] / trials[operator]
+                previous = self.success[operator]
+                self.success[operator] = rate if previous is None else previous + self.learning_rate * (rate - previous)
+        self._update_rates(genetic)
+
+        if trials[TRAY_MUTATION] > 0:
+            self.step = self._one_fifth(self.step, successes[TRAY_MUTATION] / trials[TRAY_MUTATION], 1, self.max_step)
+            genetic.mutation_step = max(1, round(self.step))
+        self.extrapolation = self._one_fifth(self.extrapolation, sum(improved) / len(improved), 0.01, self.max_extrapolation)
+        genetic.alpha_range = (-self.extrapolation, 1 + self.extrapolation)
+
+    def _update_rates(self, genetic) -> None:
+        rates = {operator: getattr(genetic, name) for operator, name in RATES.items()}
+        rates[NO_MUTATION] = max(0.0, 1 - sum(rates.values()))
+        # operators that were not tried yet keep their rate
+        tried = [operator for operator in OPERATORS if self.success[operator] is not None]
+        if len(tried) < 2:
+            return
+        total = sum(rates[operator] for operator in tried)
+        success = sum(self.success[operator] for operator in tried)
+        free = 1 - self.min_share * len(tried)
+        for operator in tried:
+            share = (self.success[operator] / success) if success > 0 else 1 / len(tried)
+            target = total * (self.min_share + free * share)
+            rates[operator] += self.learning_rate * (target - rates[operator])
+        for operator, name in RATES.items():
+            setattr(genetic, name, rates[operator])
+
+    def _one_fifth(self, value: float, success: float, lowest: float, highest: float) -> float:
+        if success > self.target_success:
+            value *= self.step_factor
+        else:
+            value /= self.step_factor ** 0.25
+        return min(highest, max(lowest, value))
+
+    def state(self) -> dict:
+        return {'success': [[operator, rate] for operator, rate in self.success.items()], 'step': self.step,
+                'extrapolation': self.extrapolation}
+
+    def set_state(self, state: dict) -> None:
+        self.success = {operator: rate for operator, rate in state['success']}
+        self.step = state['step']
+        self.extrapolation = state['extrapolation']
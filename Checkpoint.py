@@ -0,0 +1,154 @@
+import json
+import os
+import struct
+import sys
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+try:
+    from .PopulationArray import PARAMS_COUNT, np
+except:
+    from PopulationArray import PARAMS_COUNT, np
+
+# Checkpoint file layout: the magic, the length of the JSON header as uint32 and the header with the counters,
+# random states and best individual, followed by the population as raw int64 values. A vectorized population
+# is stored as its (individual, gene, slot, param) data array followed by its mask as bytes, an object population
+# as the number of elements of every gene followed by its tray records, individual after individual.
+# Records of files written before trays had an orientation are shorter, their trays are read as upright
+MAGIC = b'GENCKPT1'
+_HEADER_LENGTH = struct.Struct('<I')
+
+def encode(snapshot: dict) -> bytes:
+    header = {
+        'generation': snapshot['generation'],
+        'evaluations': snapshot['evaluations'],
+        'random_state': snapshot['random_state'],
+        'numpy_state': snapshot['numpy_state'],
+        'best': snapshot['best'],
+        'operators': snapshot.get('operators'),
+        'byteorder': sys.byteorder,
+        'params_count': PARAMS_COUNT,
+    }
+    if 'arrays' in snapshot:
+        data, mask = snapshot['arrays']
+        header['shape'] = list(mask.shape)
+        payload = data.astype(np.int64, copy=False).tobytes() + mask.astype(np.uint8).tobytes()
+    else:
+        genomes = snapshot['genomes']
+        header['population_size'] = len(genomes)
+        header['gene_count'] = len(genomes[0]) if len(genomes) > 0 else 0
+        values = array('q')
+        for genome in genomes:
+            for records in genome:
+                values.append(len(records))
+                for record in records:
+                    values.extend(record)
+        payload = values.tobytes()
+    header = json.dumps(header).encode('utf-8')
+    return MAGIC + _HEADER_LENGTH.pack(len(header)) + header + payload
+
+def decode(content: bytes) -> dict:
+    if content[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a checkpoint file")
+    offset = len(MAGIC)
+    header_length, = _HEADER_LENGTH.unpack_from(content, offset)
+    offset += _HEADER_LENGTH.size
+    header = json.loads(content[offset:offset + header_length].decode('utf-8'))
+    payload = content[offset + header_length:]
+
+    # json turns the tuples of the states into lists
+    version, internal_state, gauss_next = header['random_state']
+    genome, fitness, fitness_ex = header['best']
+    params_count = header.get('params_count', 7)
+    padding = (0,) * (PARAMS_COUNT - params_count)
+    snapshot = {
+        'generation': header['generation'],
+        'evaluations': header['evaluations'],
+        'random_state': (version, tuple(internal_state), gauss_next),
+        'numpy_state': header['numpy_state'],
+        'best': (tuple(tuple(tuple(record) + padding for record in records) for records in genome), fitness,
+                 tuple(fitness_ex) if fitness_ex is not None else None),
+        'operators': header.get('operators'),
+    }
+    swap = header['byteorder'] != sys.byteorder
+    if 'shape' in header:
+        if np is None:
+            raise ImportError("numpy is required to read a checkpoint of a vectorized population")
+        shape = tuple(header['shape'])
+        data_size = int(np.prod(shape)) * params_count * 8
+        data = np.zeros(shape + (PARAMS_COUNT,), dtype=np.int64)
+        data[..., :params_count] = np.frombuffer(payload[:data_size], dtype=np.int64).reshape(shape + (params_count,))
+        if swap:
+            data.byteswap(inplace=True)
+        mask = np.frombuffer(payload[data_size:], dtype=np.uint8).reshape(shape).astype(bool)
+        snapshot['arrays'] = (data, mask)
+    else:
+        values = array('q')
+        values.frombytes(payload)
+        if swap:
+            values.byteswap()
+        genomes = []
+        position = 0
+        for _ in range(header['population_size']):
+            genome = []
+            for _ in range(header['gene_count']):
+                count = values[position]
+                position += 1
+                genome.append(tuple(tuple(values[position + i * params_count:position + (i + 1) * params_count]) + padding
+                                    for i in range(count)))
+                position += count * params_count
+            genomes.append(tuple(genome))
+        snapshot['genomes'] = genomes
+    return snapshot
+
+def write_snapshot(snapshot: dict, path: str) -> None:
+    # written next to the target and renamed, an interrupted write leaves the previous checkpoint intact
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(encode(snapshot))
+    os.replace(temporary, path)
+
+def save_checkpoint(genetic, path: str) -> None:
+    write_snapshot(genetic.snapshot(), path)
+
+def read_checkpoint(path: str) -> dict:
+    with open(path, 'rb') as f:
+        return decode(f.read())
+
+def load_checkpoint(genetic, path: str):
+    # Restores the run saved in path into genetic, which has to be created for the same game
+    genetic.restore(read_checkpoint(path))
+    return genetic
+
+class Checkpointer:
+    # Called after every generation by Genetic.run, every interval generations a snapshot is taken and written
+    # by a background thread while the run goes on. A write still in progress is waited for before the next one
+    def __init__(self, path: str, interval: int = 10) -> None:
+        self.path = path
+        self.interval = interval
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def __call__(self, genetic) -> None:
+        if genetic.generation % self.interval == 0:
+            self.save(genetic)
+
+    def save(self, genetic) -> None:
+        snapshot = genetic.snapshot()
+        self.flush()
+        self._pending = self._executor.submit(write_snapshot, snapshot, self.path)
+
+    def flush(self) -> None:
+        # waits for the last write, errors of the write are raised here
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            pending.result()
+
+    def close(self) -> None:
+        self.flush()
+        self._executor.shutdown(wait=True)
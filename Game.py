@@ -55,11 +55,31 @@ class Game:
         return classes
     
     def total_space(self, layers=1) -> List[int]:
-        volume = self.length*self.width*self.height
-        return [int(volume/layers) for v in range(layers)]
+        # the space trays can fill, the rest of the height does not divide into layers
+        size_x, size_y, size_z = self.layer_size(layers)
+        return [size_x * size_y * size_z for v in range(layers)]
 
     def layer_size(self, layers=1) -> tuple[int, int, int]:
-        return self.width, self.length, self.height
+        # layers are stacked in z
+        return self.width, self.length, self.height // layers
 
     def bounding_box(self):
         return self.width, self.length, self.height
+
+    def canonical(self) -> tuple:
+        # Same value for games with the same box and items, independent of the order the items were added in
+        items = sorted((type(item).__name__, tuple(item.bounding_box()), count) for item, count in self._items.items())
+        return (self.width, self.length, self.height), tuple(items)
+
+# Games of the Etherfields box used by the example drivers and the benchmark
+def etherfields_game() -> Game:
+    game = Game(300, 300, 120)
+    game.add_items(Card(88, 63, 1), 100)
+    game.add_items(Card(100, 100, 1), 100)
+    return game
+
+def cards_game() -> Game:
+    # the cards only in a box too shallow for their stack
+    game = Game(88, 300, 120)
+    game.add_items(Card(88, 63, 1), 100)
+    return game
@@ -1,17 +1,38 @@
-from typing import List
+from typing import List, Dict, Sequence
 try:
-    from .Game import Game, ItemClass, Card
+    from .Game import Game, ItemClass, Card, etherfields_game
 except:
-    from Game import Game, ItemClass, Card
+    from Game import Game, ItemClass, Card, etherfields_game
+try:
+    from .PopulationArray import PopulationArray, DIM_X, DIM_Y, DIM_Z, X, Y, Z, LAYER, ORIENTATION, np
+except:
+    from PopulationArray import PopulationArray, DIM_X, DIM_Y, DIM_Z, X, Y, Z, LAYER, ORIENTATION, np
+try:
+    from .Overlap import overlap_extents, overlap_matrix, candidate_pairs, pair_volume
+except:
+    from Overlap import overlap_extents, overlap_matrix, candidate_pairs, pair_volume
+try:
+    from .Termination import Termination, MaxGenerations, Stagnation, TargetFitness, default_termination
+except:
+    from Termination import Termination, MaxGenerations, Stagnation, TargetFitness, default_termination
 
+import os
 import random
 import time
 import math
+from collections import OrderedDict
+
 
-import multiprocessing as mp
+# Mutation operators as returned by Genetic.mutate and mutate_array, moving or resizing a tray (also to
+# another layer or orientation), adding a tray to the gene and removing its last tray
+TRAY_MUTATION, ADD_ELEMENT, REMOVE_ELEMENT = range(3)
+NO_MUTATION = -1
 
 class Element:
-    def __init__(self, dim_x=0, dim_y=0, dim_z=0, x=0, y=0, z=0, layer=0) -> None:
+    # slots keep elements compact, populations hold one element per tray of every individual
+    __slots__ = ('dim_x', 'dim_y', 'dim_z', 'x', 'y', 'z', 'layer', 'orientation')
+
+    def __init__(self, dim_x=0, dim_y=0, dim_z=0, x=0, y=0, z=0, layer=0, orientation=0) -> None:
         self.dim_x = dim_x
         self.dim_y = dim_y
         self.dim_z = dim_z
@@ -19,6 +40,7 @@ class Element:
         self.y = y
         self.z = z
         self.layer = layer
+        self.orientation = orientation
 
     def get_overlap(self, other, total = True) -> float:
         return 0.0
@@ -33,7 +55,9 @@ class Element:
         pass
 
 class Tray(Element):
-    def __init__(self, dim_x=0, dim_y=0, dim_z=0, x=0, y=0, z=0, layer=0) -> None:
+    __slots__ = ()
+
+    def __init__(self, dim_x=0, dim_y=0, dim_z=0, x=0, y=0, z=0, layer=0, orientation=0) -> None:
         self.dim_x = dim_x
         self.dim_y = dim_y
         self.dim_z = dim_z
@@ -41,19 +65,40 @@ class Tray(Element):
         self.y = y
         self.z = z
         self.layer = layer
-        self._params_count = 7
+        self.orientation = orientation
+
+    def assign(self, dim_x, dim_y, dim_z, x, y, z, layer, orientation=0) -> None:
+        # overwrite the tray in place, used to reuse trays of discarded individuals
+        self.dim_x = dim_x
+        self.dim_y = dim_y
+        self.dim_z = dim_z
+        self.x = x
+        self.y = y
+        self.z = z
+        self.layer = layer
+        self.orientation = orientation
 
     @staticmethod
-    def from_game(game: Game):
-        layer_size_x, layer_size_y, layer_size_z = game.layer_size()
-        x = random.randint(0, layer_size_x - 1)
-        y = random.randint(0, layer_size_y - 1)
+    def from_game(game: Game, layers: int = 1, orientations: int = 1):
+        return Tray.random(game.layer_size(layers), layers, orientations)
+
+    @staticmethod
+    def random(layer_size: tuple, layers: int = 1, orientations: int = 1, rng: 'random.Random' = None):
+        # rng is the random number generator to draw from, the random module by default
+        rng = rng if rng is not None else random
+        layer_size_x, layer_size_y, layer_size_z = layer_size
+        x = rng.randint(0, layer_size_x - 1)
+        y = rng.randint(0, layer_size_y - 1)
         #z = random.randint(0, layer_size_z - 1)
         z = 0
-        dim_x = random.randint(1, layer_size_x - x + 1)
-        dim_y = random.randint(1, layer_size_y - y + 1)
+        dim_x = rng.randint(1, layer_size_x - x + 1)
+        dim_y = rng.randint(1, layer_size_y - y + 1)
         # dim_z = random.randint(1, layer_size_z - z + 1)
         dim_z = layer_size_z
+        # trays fill the height of their layer
+        layer = rng.randrange(layers) if layers > 1 else 0
+        z = layer * layer_size_z
+        orientation = rng.randrange(orientations) if orientations > 1 else 0
         return Tray(
             dim_x=dim_x,
             dim_y=dim_y,
@@ -61,7 +106,8 @@ class Tray(Element):
             x=x,
             y=y,
             z=z,
-            layer=0
+            layer=layer,
+            orientation=orientation
         )
 
     def get_overlap(self, other, total = True) -> float|tuple[int, int, int]:
@@ -81,27 +127,29 @@ class Tray(Element):
         else:
             return x_overlap, y_overlap, z_overlap
 
-    def mutate(self) -> float:
-        choice = random.choice(range(self._params_count))
-        k = random.randint(1, 10)
+    def mutate(self, max_step: int = 10, rng: 'random.Random' = None) -> float:
+        # the layer and the orientation are changed by the solver, see Genetic.mutate
+        rng = rng if rng is not None else random
+        choice = rng.choice(range(ORIENTATION))
+        k = rng.randint(1, max_step)
         if choice == 0:
-            self.dim_x += random.choice([-k, k])
+            self.dim_x += rng.choice([-k, k])
             self.dim_x = max(1, self.dim_x)  # Ensure dimensions are positive        
         if choice == 1:
-            self.dim_y += random.choice([-k, k])
+            self.dim_y += rng.choice([-k, k])
             self.dim_y = max(1, self.dim_y)  # Ensure dimensions are positive        
         if choice == 2 and False:
-            self.dim_z += random.choice([-k, k])
+            self.dim_z += rng.choice([-k, k])
             self.dim_z = max(1, self.dim_z)  # Ensure dimensions are positive        
 
         if choice == 3:
-            self.x += random.choice([-k, k])
+            self.x += rng.choice([-k, k])
             self.x = max(0, self.x)
         if choice == 4:
-            self.y += random.choice([-k, k])
+            self.y += rng.choice([-k, k])
             self.y = max(0, self.y)
         if choice == 5 and False:
-            self.z += random.choice([-k, k])
+            self.z += rng.choice([-k, k])
             self.z = max(0, self.z)  # Ensure dimensions are positive
 
     def copy(self):
@@ -112,37 +160,227 @@ class Tray(Element):
             self.x,
             self.y,
             self.z,
-            self.layer)
+            self.layer,
+            self.orientation)
+
+    def to_record(self) -> tuple[int, int, int, int, int, int, int, int]:
+        return self.dim_x, self.dim_y, self.dim_z, self.x, self.y, self.z, self.layer, self.orientation
 
     def display(self):
-        print(f"{self.dim_x}, {self.dim_y}, {self.dim_z}, {self.x}, {self.y}, {self.z}, {self.layer}")
+        print(f"{self.dim_x}, {self.dim_y}, {self.dim_z}, {self.x}, {self.y}, {self.z}, {self.layer}, {self.orientation}")
 class Gene:
-    def __init__(self) -> None:
-        # Each Gene represents a set of element's configuration: dimensions (x, y, z), position (x, y, z), and layer index
+    __slots__ = ('data', '_max_number_of_elements')
+
+    def __init__(self, max_number_of_elements: int = 1) -> None:
+        # Each Gene represents a set of element's configuration: dimensions (x, y, z), position (x, y, z), layer index and orientation
         self.data: List[Element] = []
-        self._max_number_of_elements = 1
+        self._max_number_of_elements = max_number_of_elements
 
     def can_add_more_elements(self):
         return len(self.data) < self._max_number_of_elements
 
 class Individual:
-    def __init__(self, gene_count: int) -> None:
+    __slots__ = ('data', 'fitness', 'fitness_ex', 'dirty', '_genome', 'terms', 'changed_genes')
+
+    def __init__(self, gene_count: int, max_number_of_elements: int = 1) -> None:
         # An individual is composed of multiple genes, each representing a set of elements for each item class
-        self.data: List[Gene] = [Gene() for _ in range(gene_count)]
+        self.data: List[Gene] = [Gene(max_number_of_elements) for _ in range(gene_count)]
+        self.fitness = None
+        self.fitness_ex = None
+        # fitness is only valid while the individual is clean, anything changing its elements marks it dirty
+        self.dirty = True
+        self._genome = None
+        # per gene penalty terms of the last evaluation and the genes changed since then
+        self.terms: FitnessTerms = None
+        self.changed_genes = set()
+
+    def genome(self) -> tuple:
+        # Content of the individual as nested tuples of tray records, used as the fitness cache key
+        if self._genome is None:
+            self._genome = tuple(tuple(el.to_record() for el in gene.data) for gene in self.data)
+        return self._genome
+
+    def copy(self):
+        individual = Individual(len(self.data), self.data[0]._max_number_of_elements if self.data else 1)
+        for gene, other_gene in zip(individual.data, self.data):
+            gene.data = [el.copy() for el in other_gene.data]
+        individual.fitness = self.fitness
+        individual.fitness_ex = self.fitness_ex
+        individual.dirty = self.dirty
+        individual.terms = self.terms.copy() if self.terms is not None else None
+        individual.changed_genes = set(self.changed_genes)
+        return individual
+
+    def mark_dirty(self, gene_index: int = None) -> None:
+        # without a gene index the whole individual is considered changed
+        self.dirty = True
+        self._genome = None
         self.fitness = None
         self.fitness_ex = None
+        if gene_index is None:
+            self.terms = None
+            self.changed_genes.clear()
+        else:
+            self.changed_genes.add(gene_index)
+
+class FitnessTerms:
+    # Penalty contributions of an individual split per gene and per pair of genes together with their totals,
+    # so that after a change to a few genes only the terms involving those genes have to be recomputed
+    __slots__ = ('volume', 'unfit', 'overfit', 'overlap', 'volume_total', 'overlap_total', 'unfit_total', 'overfit_total')
+
+    def __init__(self, gene_count: int, layers_count: int) -> None:
+        self.volume: List[List[int]] = [[0] * layers_count for _ in range(gene_count)]
+        self.unfit: List[int] = [0] * gene_count
+        self.overfit: List[int] = [0] * gene_count
+        # overlap[i][j] is the per layer overlap between genes i and j (within gene i for i == j),
+        # stored symmetrically and only for pairs that overlap
+        self.overlap: List[Dict[int, List[int]]] = [{} for _ in range(gene_count)]
+        self.volume_total: List[int] = [0] * layers_count
+        self.overlap_total: List[int] = [0] * layers_count
+        self.unfit_total = 0
+        self.overfit_total = 0
+
+    def set_gene(self, i: int, volume: List[int], unfit: int, overfit: int) -> None:
+        self.volume_total = [total - old + new for total, old, new in zip(self.volume_total, self.volume[i], volume)]
+        self.unfit_total += unfit - self.unfit[i]
+        self.overfit_total += overfit - self.overfit[i]
+        self.volume[i], self.unfit[i], self.overfit[i] = volume, unfit, overfit
+
+    def set_pair(self, i: int, j: int, overlap: List[int]) -> None:
+        old = self.overlap[i].pop(j, None)
+        if old is not None:
+            self.overlap[j].pop(i, None)
+            self.overlap_total = [total - o for total, o in zip(self.overlap_total, old)]
+        if any(overlap):
+            self.overlap[i][j] = overlap
+            self.overlap[j][i] = overlap
+            self.overlap_total = [total + o for total, o in zip(self.overlap_total, overlap)]
+
+    def copy(self):
+        terms = FitnessTerms.__new__(FitnessTerms)
+        terms.volume = self.volume[:]
+        terms.unfit = self.unfit[:]
+        terms.overfit = self.overfit[:]
+        terms.overlap = [dict(pairs) for pairs in self.overlap]
+        terms.volume_total = self.volume_total[:]
+        terms.overlap_total = self.overlap_total[:]
+        terms.unfit_total = self.unfit_total
+        terms.overfit_total = self.overfit_total
+        return terms
+
+class FitnessCache:
+    # Bounded least recently used cache of (fitness, fitness_ex) keyed by genome
+    def __init__(self, max_size: int) -> None:
+        self._entries = OrderedDict()
+        self._max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry) -> None:
+        if self._max_size <= 0:
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+class GameTables:
+    # Values of the game the solver needs on every evaluation and operator, computed once per solver.
+    # required[i][o] is the space the items of gene i take in orientation o, upright first
+    # (ItemClass.bounding_box(True)) and turned second, required_array holds the same as a read only array
+    __slots__ = ('bounding_box', 'max_volume', 'fitness_scale', 'layer_size', 'total_space', 'required', 'required_array')
+
+    def __init__(self, game: Game, item_classes: List[ItemClass], layers: int = 1) -> None:
+        self.bounding_box: tuple = tuple(game.bounding_box())
+        max_x, max_y, max_z = self.bounding_box
+        self.max_volume = max_x * max_y * max_z
+        self.fitness_scale = self.max_volume / 100
+        self.layer_size: tuple = tuple(game.layer_size(layers))
+        self.total_space: tuple = tuple(game.total_space(layers))
+        self.required: tuple = tuple(tuple(tuple(item_class.bounding_box(vertical)) for vertical in (True, False))
+                                     for item_class in item_classes)
+        self.required_array = None
+        if np is not None:
+            self.required_array = np.array(self.required, dtype=np.int64).reshape(len(self.required), 2, 3)
+            self.required_array.flags.writeable = False
+
+class PopulationView(Sequence):
+    # Read-only view of a PopulationArray as a sequence of individuals, each individual is materialized on access
+    def __init__(self, genetic, arrays: PopulationArray) -> None:
+        self._genetic = genetic
+        self._arrays = arrays
+
+    def __len__(self) -> int:
+        return self._arrays.population_size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._genetic.individual_from_array(self._arrays, index)
 
 class Genetic:
     def __init__(self, game: Game, population_size: int, number_of_elements_factor: float, unused_space_factor: float,
-                 unfit_factor: float, overlap_factor: float, overfit_factor: float) -> None:
+                 unfit_factor: float, overlap_factor: float, overfit_factor: float, vectorized: bool = False,
+                 fitness_cache_size: int = 10000, max_number_of_elements: int = 1, seed: int = None,
+                 repair_collisions: bool = False, layers: int = 1, orientations: int = 1,
+                 local_search: 'PatternSearch' = None, adaptation: 'OperatorAdaptation' = None) -> None:
+        # A seed makes the run reproducible, the operators draw from generators of their own seeded with it.
+        # With repair_collisions the repair also removes overlaps between trays of different genes.
+        # With more than one layer the box is split in z into layers of equal height, every tray fills the
+        # height of its layer and the unused space is accounted per layer.
+        # With two orientations the items of a tray may also be turned on their side, the orientation of
+        # every tray is searched along with its placement.
+        # A local search, e.g. LocalSearch.PatternSearch, refines the elites when it is due.
+        # An adaptation, e.g. Adaptation.OperatorAdaptation, adjusts the operator rates, the mutation step and
+        # the crossover range to the success of the operators after every generation
+        if orientations not in (1, 2):
+            raise ValueError("orientations must be 1 or 2")
+        # the operators draw from their own generators, runs do not affect each other or the random module
+        self._random = random.Random(seed)
         self.mutation_rate = 0.5
         self.mutation_rate_number_of_elements_up = 0.1
         self.mutation_rate_number_of_elements_down = 0.1
+        # chance of a mutated tray to move to another layer
+        self.mutation_rate_layer = 0.1
+        # chance of a mutated tray to turn its items
+        self.mutation_rate_orientation = 0.1
+        # largest change of a tray parameter by a mutation and the range of the blending factor of the crossover
+        self.mutation_step = 10
+        self.alpha_range = (-0.05, 1.05)
         self._tournament_size = max(4, population_size // 100)
 
-        self._total_space: List[int] = game.total_space()
+        self._layers = layers
+        self._orientations = orientations
         self._game = game
         self._item_classes: List[ItemClass] = game.generate_classes()
+        self._tables = GameTables(game, self._item_classes, layers)
+        self._total_space = self._tables.total_space
         gene_count = len(self._item_classes)
 
         self._number_of_elements_factor = number_of_elements_factor
@@ -150,85 +388,399 @@ class Genetic:
         self._unfit_factor = unfit_factor
         self._overlap_factor = overlap_factor
         self._overfit_factor = overfit_factor
+        self._max_number_of_elements = max_number_of_elements
+        self._repair_collisions = repair_collisions
+        self.local_search = local_search
+        self.adaptation = adaptation
+        # operator and parent fitness of the children of the last generation, see credit_offspring
+        self._offspring = None
+        self.fitness_cache = FitnessCache(fitness_cache_size)
+        self._spare_individuals: List[Individual] = []
+        # number of individuals scored, cache hits excluded
+        self.evaluations = 0
+        # slots at the front of the population holding seeds, see seed_population
+        self._seeded = 0
+        self.generation = 0
+        self.termination_reason = None
 
         # Initialize population with a given size and number of genes per individual
-        self.population: List[Individual] = [Individual(gene_count) for _ in range(population_size)]
+        self._arrays: PopulationArray = None
+        self._population: List[Individual] = [Individual(gene_count, max_number_of_elements) for _ in range(population_size)]
         self._population_size = population_size
 
-        for i, ind in enumerate(self.population):
+        for i, ind in enumerate(self._population):
             for gene in ind.data:
-                gene.data.append(Tray.from_game(game))
+                gene.data.append(self.random_tray())
             self.repair_individual(ind)
 
+        # In vectorized mode the population is kept in a PopulationArray and the genetic operators
+        # run on the whole population at once, individuals are only materialized on request
+        self._vectorized = vectorized
+        self._fitness = None
+        self._fitness_ex = None
+        if vectorized:
+            if np is None:
+                raise ImportError("numpy is required for the vectorized population mode")
+            self._rng = np.random.default_rng(seed)
+            self._arrays = self.to_array(self._population)
+            self._population = None
+
         #self._populations: List[List[Individual]] = [self.population.copy()]
 
-    def compute_fitness(self, individual: Individual) -> float:
-        number_of_elements = sum([len(x.data) for x in individual.data])
-        min_number_of_elements = sum([ 1 for x in individual.data ])
-        unused_space = self._total_space.copy()
-        unfit_penalty = 0
-        overfit_penalty = 0
-        overlap_penalty = 0
-        max_x, max_y, max_z = self._game.bounding_box()
-        max_volume = max_x * max_y * max_z
-        for i, gene in enumerate(individual.data):
-            item_class = self._item_classes[i]
-            required_x, required_y, required_z = item_class.bounding_box()
-            unfit_x, unfit_y, unfit_z = 0, 0, 0
-            overfit_x, overfit_y, overfit_z = 0, 0, 0
-            stacked_y = 0
-            for j, element in enumerate(gene.data):
-                unused_space[element.layer] -= element.dim_x * element.dim_y * element.dim_z
+    def context(self) -> dict:
+        # Everything needed to rebuild an equivalent Genetic without its population, e.g. in a worker process
+        return {
+            'game': self._game,
+            'number_of_elements_factor': self._number_of_elements_factor,
+            'unused_space_factor': self._unused_space_factor,
+            'unfit_factor': self._unfit_factor,
+            'overlap_factor': self._overlap_factor,
+            'overfit_factor': self._overfit_factor,
+            'max_number_of_elements': self._max_number_of_elements,
+            'repair_collisions': self._repair_collisions,
+            'layers': self._layers,
+            'orientations': self._orientations,
+        }
 
-                # Accumulate stacked height in y
-                stacked_y += element.dim_y
+    @staticmethod
+    def from_context(context: dict, population_size: int = 0, **kwargs):
+        return Genetic(population_size=population_size, **context, **kwargs)
+
+    @property
+    def population(self) -> Sequence[Individual]:
+        if self._vectorized:
+            return PopulationView(self, self._arrays)
+        return self._population
+
+    @population.setter
+    def population(self, population: List[Individual]) -> None:
+        self._fitness = None
+        self._fitness_ex = None
+        if self._vectorized:
+            self._arrays = self.to_array(population)
+        else:
+            self._population = population
+
+    def to_array(self, individuals: List[Individual]) -> PopulationArray:
+        max_number_of_elements = max((gene._max_number_of_elements for ind in individuals for gene in ind.data),
+                                     default=self._max_number_of_elements)
+        return PopulationArray.from_records([ind.genome() for ind in individuals], len(self._item_classes), max_number_of_elements)
+
+    def individual_from_genome(self, genome: tuple) -> Individual:
+        individual = Individual(len(genome), self._max_number_of_elements)
+        for gene, records in zip(individual.data, genome):
+            gene.data = [Tray(*record) for record in records]
+        return individual
+
+    def individual_from_trays(self, trays: List[dict], bounding_box: tuple = None) -> Individual:
+        # Inverse of individual_to_trays, the trays are scaled from the bounding box they were laid out in to the
+        # one of this game. Trays without a gene key are given to the genes in order, genes without a tray get a
+        # random one and trays of genes this game does not have are dropped
+        gene_count = len(self._item_classes)
+        max_x, max_y, max_z = self._tables.bounding_box
+        source_x, source_y, source_z = bounding_box if bounding_box is not None else (max_x, max_y, max_z)
+        scale_x, scale_y, scale_z = max_x / source_x, max_y / source_y, max_z / source_z
+
+        layer_size_z = self._tables.layer_size[2]
+        individual = Individual(gene_count, self._max_number_of_elements)
+        for i, tray in enumerate(trays):
+            gene_index = tray.get('gene', i)
+            if gene_index >= gene_count:
+                continue
+            gene = individual.data[gene_index]
+            if len(gene.data) >= gene._max_number_of_elements:
+                continue
+            z = round(tray['z'] * 10 * scale_z)
+            gene.data.append(Tray(max(1, round(tray['Width'] * 10 * scale_x)),
+                                  max(1, round(tray['Length'] * 10 * scale_y)),
+                                  max(1, round(tray['Height'] * 10 * scale_z)),
+                                  round(tray['x'] * 10 * scale_x),
+                                  round(tray['y'] * 10 * scale_y),
+                                  z, min(self._layers - 1, z // layer_size_z),
+                                  min(self._orientations - 1, tray.get('orientation', 0))))
+        for gene in individual.data:
+            if len(gene.data) == 0:
+                gene.data.append(self.random_tray())
+        self.repair_individual(individual)
+        return individual
+
+    def warm_start(self, layouts: List[List[dict]], fraction: float = 0.5, bounding_box: tuple = None) -> None:
+        # Seeds a fraction of the population with earlier layouts, e.g. winners of a similar game as returned
+        # by individual_to_trays
+        self.seed_population([self.individual_from_trays(layout, bounding_box) for layout in layouts], fraction)
+
+    def pack_start(self, fraction: float = 0.1) -> None:
+        # Seeds a fraction of the population with the constructive layout of the packer
+        try:
+            from .Packer import pack
+        except:
+            from Packer import pack
+        seed = pack(self._game, self._max_number_of_elements, self._layers)
+        self.repair_individual(seed)
+        self.seed_population([seed], fraction)
+
+    def seed_population(self, seeds: List[Individual], fraction: float) -> None:
+        # Replaces a fraction of the population by the seeds, used once as they are and then as mutated copies
+        # so the seeded part does not start from a single point, the rest of the population stays random for diversity.
+        # Seeds follow the slots seeded by earlier calls, e.g. warm_start after pack_start keeps the packed layouts
+        start = self._seeded
+        count = min(self._population_size - start, round(fraction * self._population_size))
+        if count <= 0 or len(seeds) == 0:
+            return
+        population = list(self.population)
+        for i in range(count):
+            individual = seeds[i % len(seeds)]
+            if i >= len(seeds):
+                individual = individual.copy()
+                self.mutate(individual)
+                self.repair_individual(individual)
+            population[start + i] = individual
+        self.population = population
+        self._seeded = start + count
+
+    def individual_from_array(self, arrays: PopulationArray, index: int) -> Individual:
+        individual = self.individual_from_genome(arrays.to_records(index))
+        if arrays is self._arrays and self._fitness is not None and not np.isnan(self._fitness[index]):
+            individual.fitness = float(self._fitness[index])
+            individual.fitness_ex = tuple(self._fitness_ex[index].tolist())
+            individual.dirty = False
+        return individual
+
+    def top_genomes(self, count: int) -> List[tuple]:
+        if self._vectorized:
+            fitness = self.compute_fitness_array()
+            return [self._arrays.to_records(i) for i in np.argsort(-fitness, kind='stable')[:count]]
+        self.evaluate_population()
+        return [ind.genome() for ind in sorted(self.population, key=self.compute_fitness, reverse=True)[:count]]
+
+    def replace_worst(self, genomes: List[tuple]) -> None:
+        # Replace the worst individuals of the population with the given genomes, e.g. immigrants from another population
+        genomes = genomes[:self._population_size]
+        individuals = [self.individual_from_genome(genome) for genome in genomes]
+        if len(individuals) == 0:
+            return
+        if self._vectorized:
+            fitness = self.compute_fitness_array()
+            worst = np.argsort(fitness, kind='stable')[:len(individuals)]
+            incoming = self.to_array(individuals)
+            slots = min(incoming.max_number_of_elements, self._arrays.max_number_of_elements)
+            self._arrays.data[worst] = 0
+            self._arrays.mask[worst] = False
+            self._arrays.data[worst, :, :slots] = incoming.data[:, :, :slots]
+            self._arrays.mask[worst, :, :slots] = incoming.mask[:, :, :slots]
+            self._fitness[worst] = np.nan
+            return
+        self.evaluate_population()
+        population = sorted(self.population, key=self.compute_fitness)
+        self.population = individuals + population[len(individuals):]
+
+    def select_loser(self) -> int:
+        # index of the worst individual of a random tournament
+        fitness = self.compute_fitness_array() if self._vectorized else None
+        tournament = self._random.sample(range(self._population_size), self._tournament_size)
+        if fitness is not None:
+            return min(tournament, key=lambda i: fitness[i])
+        return min(tournament, key=lambda i: self.compute_fitness(self._population[i]))
+
+    def replace_at(self, index: int, individual: Individual) -> None:
+        if self._vectorized:
+            incoming = self.to_array([individual])
+            slots = min(incoming.max_number_of_elements, self._arrays.max_number_of_elements)
+            self._arrays.data[index] = 0
+            self._arrays.mask[index] = False
+            self._arrays.data[index, :, :slots] = incoming.data[0, :, :slots]
+            self._arrays.mask[index, :, :slots] = incoming.mask[0, :, :slots]
+            self._fitness[index] = np.nan if individual.dirty else individual.fitness
+            if not individual.dirty:
+                self._fitness_ex[index] = individual.fitness_ex
+            return
+        self._population[index] = individual
+
+    def best(self) -> Individual:
+        if self._vectorized:
+            fitness = self.compute_fitness_array()
+            return self.individual_from_array(self._arrays, int(np.argmax(fitness)))
+        self.evaluate_population()
+        return max(self.population, key=self.compute_fitness)
+
+    def snapshot(self) -> dict:
+        # Everything needed to continue the run: population, random states and counters, the arrays are
+        # copied so the run can go on while the snapshot is written, see Checkpoint for the file format
+        best = self.best()
+        snapshot = {
+            'generation': self.generation,
+            'evaluations': self.evaluations,
+            'random_state': self._random.getstate(),
+            'numpy_state': self._rng.bit_generator.state if self._vectorized else None,
+            'best': (best.genome(), float(best.fitness), tuple(float(v) for v in best.fitness_ex)),
+            'operators': self.operator_state(),
+        }
+        if self._vectorized:
+            snapshot['arrays'] = (self._arrays.data.copy(), self._arrays.mask.copy())
+        else:
+            snapshot['genomes'] = [ind.genome() for ind in self._population]
+        return snapshot
+
+    def restore(self, snapshot: dict) -> None:
+        # Continues the run of a snapshot taken from a Genetic of the same game, the fitness is recomputed
+        if 'arrays' in snapshot:
+            arrays = PopulationArray.from_arrays(*snapshot['arrays'])
+            if arrays.gene_count != len(self._item_classes):
+                raise ValueError(f"Snapshot has {arrays.gene_count} genes, expected {len(self._item_classes)}")
+            population = arrays if self._vectorized else [self.individual_from_genome(arrays.to_records(i))
+                                                          for i in range(arrays.population_size)]
+        else:
+            genomes = snapshot['genomes']
+            if any(len(genome) != len(self._item_classes) for genome in genomes):
+                raise ValueError(f"Snapshot genomes do not have {len(self._item_classes)} genes")
+            population = [self.individual_from_genome(genome) for genome in genomes]
+
+        if isinstance(population, PopulationArray):
+            self._arrays = population
+            self._fitness = None
+            self._fitness_ex = None
+            self._population_size = population.population_size
+        else:
+            self.population = population
+            self._population_size = len(population)
+        self.generation = snapshot['generation']
+        self.evaluations = snapshot['evaluations']
+        self._random.setstate(snapshot['random_state'])
+        if self._vectorized and snapshot['numpy_state'] is not None:
+            self._rng.bit_generator.state = snapshot['numpy_state']
+        if snapshot.get('operators') is not None:
+            self.set_operator_state(snapshot['operators'])
+
+    def operator_state(self) -> dict:
+        # operator settings that change during the run, plain values so they can be stored as JSON
+        return {
+            'mutation_rate': self.mutation_rate,
+            'mutation_rate_number_of_elements_up': self.mutation_rate_number_of_elements_up,
+            'mutation_rate_number_of_elements_down': self.mutation_rate_number_of_elements_down,
+            'mutation_step': self.mutation_step,
+            'alpha_range': list(self.alpha_range),
+            'offspring': self._offspring,
+            'adaptation': self.adaptation.state() if self.adaptation is not None else None,
+        }
+
+    def set_operator_state(self, state: dict) -> None:
+        self.mutation_rate = state['mutation_rate']
+        self.mutation_rate_number_of_elements_up = state['mutation_rate_number_of_elements_up']
+        self.mutation_rate_number_of_elements_down = state['mutation_rate_number_of_elements_down']
+        self.mutation_step = state['mutation_step']
+        self.alpha_range = tuple(state['alpha_range'])
+        self._offspring = state['offspring']
+        if self.adaptation is not None and state['adaptation'] is not None:
+            self.adaptation.set_state(state['adaptation'])
+
+    def credit_offspring(self, fitness: Sequence[float]) -> None:
+        # Tells the adaptation which children of the last generation improved on the better of their parents,
+        # fitness is the fitness of the current population, whose children start after the elites
+        if self._offspring is None:
+            return
+        start, operators, parent_fitness = self._offspring['start'], self._offspring['operators'], self._offspring['parent_fitness']
+        self._offspring = None
+        if self.adaptation is not None:
+            improved = [f > parent for f, parent in zip(fitness[start:start + len(operators)], parent_fitness)]
+            self.adaptation.update(self, operators, improved)
+
+    def diversity(self) -> float:
+        # Mean standard deviation over the population of the first tray of every gene, relative to the
+        # bounding box, 0 once all individuals place their first trays the same
+        max_x, max_y, max_z = self._tables.bounding_box
+        scale = (max_x, max_y, max_z, max_x, max_y, max_z)
+        if self._vectorized:
+            first = self._arrays.data[:, :, 0, :LAYER]
+        else:
+            first = [[gene.data[0].to_record()[:LAYER] for gene in ind.data] for ind in self._population]
+        if np is not None:
+            return float((np.asarray(first, dtype=np.float64).std(axis=0) / scale).mean())
+
+        count = len(first)
+        total = 0.0
+        for j in range(len(first[0])):
+            for p in range(LAYER):
+                values = [first[i][j][p] for i in range(count)]
+                mean = sum(values) / count
+                total += math.sqrt(sum((v - mean) ** 2 for v in values) / count) / scale[p]
+        return total / (len(first[0]) * LAYER)
+
+    def evaluate_population(self, individuals: Sequence[Individual] = None) -> None:
+        # Scores the dirty individuals (of the population by default) in one batched fitness pass with the same
+        # fitness as compute_fitness, genomes found in the fitness cache or repeated in the batch are scored once.
+        # The batch is faster than the incremental scoring of compute_fitness even for children with a single
+        # changed gene, so the incremental terms are only kept without numpy. benchmark.py --fitness times it
+        if self._vectorized and individuals is None:
+            self.compute_fitness_array()
+            return
+        individuals = self.population if individuals is None else individuals
+        pending = self.pending_evaluations(individuals)
+        if len(pending) == 0:
+            return
+        if np is None:
+            for genome, same in pending.items():
+                self.compute_fitness(same[0])
+                self.store_evaluation(genome, same, (same[0].fitness, same[0].fitness_ex))
+            return
+        genomes = list(pending.keys())
+        fitness, fitness_ex = self.compute_fitness_array(self.to_array([pending[genome][0] for genome in genomes]))
+        for genome, f, ex in zip(genomes, fitness.tolist(), fitness_ex.tolist()):
+            self.store_evaluation(genome, pending[genome], (f, tuple(ex)))
+
+    def pending_evaluations(self, individuals: Sequence[Individual]) -> Dict[tuple, List[Individual]]:
+        # dirty individuals grouped by genome, individuals found in the fitness cache are given their fitness
+        pending = {}
+        for individual in individuals:
+            if not individual.dirty:
+                continue
+            key = individual.genome()
+            entry = self.fitness_cache.get(key)
+            if entry is not None:
+                individual.fitness, individual.fitness_ex = entry
+                individual.dirty = False
+            else:
+                pending.setdefault(key, []).append(individual)
+        return pending
 
-            # the stacking is in y direction
-            # Check if element dimensions meet or exceed item class requirements in x and z
-            for j, element in enumerate(gene.data):
-                #unfit_x = max(unfit_x, max(0, required_x - element.dim_x) * max(1, element.dim_y) * max(1, element.dim_z))
-                unfit_x += max(0, required_x - element.dim_x) * max(1, element.dim_y) * max(1, element.dim_z)
-                #unfit_z = max(unfit_z, max(0, required_z - element.dim_z) * max(1, element.dim_x) * max(1, element.dim_y))
-                unfit_z += max(0, required_z - element.dim_z) * max(1, element.dim_x) * max(1, element.dim_y)
-                #unfit_y = max(unfit_y, max(0, required_y - stacked_y) * max(1, element.dim_x) * max(1, element.dim_z))
-                unfit_y += max(0, required_y - stacked_y) * max(1, element.dim_x) * max(1, element.dim_z)
-
-            # check if element is outside the box
-            for j, element in enumerate(gene.data):
-                #overfit_x = (max(overfit_x, max(0, element.dim_x + element.x - max_x))
-                #overfit_x = (max(overfit_x, max(0, element.dim_x + element.x - max_x))
-                #             * max(1, element.dim_y) * max(1, element.dim_z))
-                overfit_x += max(0, element.dim_x + element.x - max_x) * max(1, element.dim_y) * max(1, element.dim_z)
-                #overfit_y = (max(overfit_y, max(0, element.dim_y + element.y - max_y))
-                #             * max(1, element.dim_x) * max(1, element.dim_z))
-                overfit_y += max(0, element.dim_y + element.y - max_y) * max(1, element.dim_x) * max(1, element.dim_z)
-                #overfit_z = (max(overfit_z, max(0, element.dim_z + element.z - max_z)) * max(1, element.dim_x)
-                #             * max(1, element.dim_y))
-                overfit_z += max(0, element.dim_z + element.z - max_z) * max(1, element.dim_x) * max(1, element.dim_y)
-
-            # add to penalties
-            if unfit_x > 0 or unfit_y > 0 or unfit_z > 0:
-                unfit_penalty += max(1, unfit_x) * max(1, unfit_y) * max(1, unfit_z)
-            if overfit_x > 0 or overfit_y > 0 or overfit_z > 0:
-                overfit_penalty += max(1, overfit_x) * max(1, overfit_y) * max(1, overfit_z)
+    def store_evaluation(self, genome: tuple, individuals: List[Individual], entry: tuple) -> None:
+        self.fitness_cache.put(genome, entry)
+        for individual in individuals:
+            individual.fitness, individual.fitness_ex = entry
+            individual.dirty = False
 
-            for j, element in enumerate(gene.data):
-                for other_element in gene.data[j+1:]:
-                    if other_element.layer != element.layer:
-                        continue
-                    overlap = element.get_overlap(other_element)
-                    unused_space[element.layer] += overlap
-                    overlap_penalty += overlap
+    def compute_fitness(self, individual: Individual) -> float:
+        if not individual.dirty:
+            return individual.fitness
+
+        key = individual.genome()
+        entry = self.fitness_cache.get(key)
+        if entry is None:
+            self._compute_fitness(individual)
+            self.fitness_cache.put(key, (individual.fitness, individual.fitness_ex))
+        else:
+            individual.fitness, individual.fitness_ex = entry
+        individual.dirty = False
+        return individual.fitness
+
+    def _compute_fitness(self, individual: Individual) -> float:
+        self.evaluations += 1
+        # Only the terms of the genes changed since the last evaluation are recomputed when possible
+        terms = individual.terms
+        if terms is None or 2 * len(individual.changed_genes) > len(individual.data):
+            terms = self.compute_terms(individual)
+        else:
+            for i in individual.changed_genes:
+                self.update_terms(individual, terms, i)
+        individual.terms = terms
+        individual.changed_genes.clear()
 
-            for j in range(i+1, len(individual.data)):
-                other_gene = individual.data[j]
-                for element in gene.data:
-                    for other_element in other_gene.data:
-                        if other_element.layer != element.layer:
-                            continue
-                        overlap = element.get_overlap(other_element)
-                        unused_space[element.layer] += overlap
-                        overlap_penalty += overlap
+        number_of_elements = sum([len(x.data) for x in individual.data])
+        min_number_of_elements = sum([ 1 for x in individual.data ])
+        unused_space = [total - volume + overlap for total, volume, overlap
+                        in zip(self._total_space, terms.volume_total, terms.overlap_total)]
+        unfit_penalty = terms.unfit_total
+        overlap_penalty = sum(terms.overlap_total)
+        overfit_penalty = terms.overfit_total
 
         fitness = ((self._unused_space_factor * sum(map(lambda x: abs(x), unused_space))
                    + self._unfit_factor * abs(unfit_penalty))
@@ -236,7 +788,7 @@ class Genetic:
                    + self._overfit_factor * abs(overfit_penalty))
 
         # -self._number_of_elements_factor * number_of_elements
-        fitness /= max_volume / 100
+        fitness /= self._tables.fitness_scale
         fitness += self._number_of_elements_factor * ( number_of_elements - min_number_of_elements ) / len(individual.data) / 100
         fitness = -fitness
 
@@ -244,79 +796,221 @@ class Genetic:
         individual.fitness_ex = sum(map(lambda x: abs(x), unused_space)), unfit_penalty, overlap_penalty, overfit_penalty
         return fitness
 
+    def gene_terms(self, i: int, gene: Gene) -> tuple[List[int], int, int]:
+        volume = [0] * len(self._total_space)
+        max_x, max_y, max_z = self._tables.bounding_box
+        required = self._tables.required[i]
+        # the stacked thickness does not depend on the orientation
+        required_y = required[0][1]
+        unfit_x, unfit_y, unfit_z = 0, 0, 0
+        overfit_x, overfit_y, overfit_z = 0, 0, 0
+        unfit_penalty = 0
+        overfit_penalty = 0
+        stacked_y = 0
+        for j, element in enumerate(gene.data):
+            volume[element.layer] += element.dim_x * element.dim_y * element.dim_z
+
+            # Accumulate stacked height in y
+            stacked_y += element.dim_y
+
+        # the stacking is in y direction
+        # Check if element dimensions meet or exceed item class requirements in x and z
+        for j, element in enumerate(gene.data):
+            required_x, _, required_z = required[element.orientation]
+            #unfit_x = max(unfit_x, max(0, required_x - element.dim_x) * max(1, element.dim_y) * max(1, element.dim_z))
+            unfit_x += max(0, required_x - element.dim_x) * max(1, element.dim_y) * max(1, element.dim_z)
+            #unfit_z = max(unfit_z, max(0, required_z - element.dim_z) * max(1, element.dim_x) * max(1, element.dim_y))
+            unfit_z += max(0, required_z - element.dim_z) * max(1, element.dim_x) * max(1, element.dim_y)
+            #unfit_y = max(unfit_y, max(0, required_y - stacked_y) * max(1, element.dim_x) * max(1, element.dim_z))
+            unfit_y += max(0, required_y - stacked_y) * max(1, element.dim_x) * max(1, element.dim_z)
+
+        # check if element is outside the box
+        for j, element in enumerate(gene.data):
+            #overfit_x = (max(overfit_x, max(0, element.dim_x + element.x - max_x))
+            #overfit_x = (max(overfit_x, max(0, element.dim_x + element.x - max_x))
+            #             * max(1, element.dim_y) * max(1, element.dim_z))
+            overfit_x += max(0, element.dim_x + element.x - max_x) * max(1, element.dim_y) * max(1, element.dim_z)
+            #overfit_y = (max(overfit_y, max(0, element.dim_y + element.y - max_y))
+            #             * max(1, element.dim_x) * max(1, element.dim_z))
+            overfit_y += max(0, element.dim_y + element.y - max_y) * max(1, element.dim_x) * max(1, element.dim_z)
+            #overfit_z = (max(overfit_z, max(0, element.dim_z + element.z - max_z)) * max(1, element.dim_x)
+            #             * max(1, element.dim_y))
+            overfit_z += max(0, element.dim_z + element.z - max_z) * max(1, element.dim_x) * max(1, element.dim_y)
+
+        # add to penalties
+        if unfit_x > 0 or unfit_y > 0 or unfit_z > 0:
+            unfit_penalty += max(1, unfit_x) * max(1, unfit_y) * max(1, unfit_z)
+        if overfit_x > 0 or overfit_y > 0 or overfit_z > 0:
+            overfit_penalty += max(1, overfit_x) * max(1, overfit_y) * max(1, overfit_z)
+
+        return volume, unfit_penalty, overfit_penalty
+
+    def compute_terms(self, individual: Individual) -> FitnessTerms:
+        terms = FitnessTerms(len(individual.data), len(self._total_space))
+        for i, gene in enumerate(individual.data):
+            terms.set_gene(i, *self.gene_terms(i, gene))
+
+        # overlaps between all elements on the same layer, both within a gene and across genes,
+        # only the pairs found by the sweep over x are measured
+        elements = [element for gene in individual.data for element in gene.data]
+        genes = [i for i, gene in enumerate(individual.data) for _ in gene.data]
+        pairs = {}
+        for l, indices in enumerate(self.layer_buckets(elements)):
+            # layers do not interact, each is swept on its own
+            position, size, layer = self.element_boxes([elements[j] for j in indices])
+            for j, k in candidate_pairs(position, size, layer):
+                key = genes[indices[j]], genes[indices[k]]
+                if key not in pairs:
+                    pairs[key] = [0] * len(self._total_space)
+                pairs[key][l] += pair_volume(position, size, j, k)
+        for (i, j), overlap in pairs.items():
+            terms.set_pair(i, j, overlap)
+        return terms
+
+    def update_terms(self, individual: Individual, terms: FitnessTerms, i: int) -> None:
+        # recompute the terms of gene i and of its overlaps with every gene
+        gene = individual.data[i]
+        terms.set_gene(i, *self.gene_terms(i, gene))
+        for j, other_gene in enumerate(individual.data):
+            overlap = [0] * len(self._total_space)
+            for k, element in enumerate(gene.data):
+                others = gene.data[k + 1:] if i == j else other_gene.data
+                for other_element in others:
+                    if other_element.layer == element.layer:
+                        overlap[element.layer] += element.get_overlap(other_element)
+            terms.set_pair(i, j, overlap)
+
+    def layer_buckets(self, elements: List[Element]) -> List[List[int]]:
+        # indices of the elements on each layer, in element order
+        if self._layers == 1:
+            return [list(range(len(elements)))]
+        buckets = [[] for _ in range(self._layers)]
+        for j, element in enumerate(elements):
+            buckets[element.layer].append(j)
+        return buckets
+
+    @staticmethod
+    def element_boxes(elements: List[Element]) -> tuple:
+        return ([(el.x, el.y, el.z) for el in elements], [(el.dim_x, el.dim_y, el.dim_z) for el in elements],
+                [el.layer for el in elements])
+
     def select_distinct(self, number_of_winners: int) -> List[Individual]:
         selected = set()
         winners = []
         while len(winners) < number_of_winners:
-            tournament = [ind for ind in random.sample(self.population, self._tournament_size) if ind not in selected]
+            tournament = [ind for ind in self._random.sample(self.population, self._tournament_size) if ind not in selected]
             winner = max(tournament, key=self.compute_fitness)
             winners.append(winner)
             selected.add(winner)
         return winners
 
     def select(self) -> Individual:
-        tournament = random.sample(self.population, self._tournament_size)
+        tournament = self._random.sample(self.population, self._tournament_size)
+        if any(ind.dirty for ind in tournament):
+            self.evaluate_population(tournament)
         winner = max(tournament, key=self.compute_fitness)
         return winner
 
-    def blended_crossover(self, parent1: Individual, parent2: Individual, alpha_range=(-0.05, 1.05)):
-        child = Individual(len(parent1.data))
+    def blended_crossover(self, parent1: Individual, parent2: Individual, alpha_range=None):
+        # the child and its trays are taken from the individuals discarded in the previous generation when possible
+        alpha_range = alpha_range if alpha_range is not None else self.alpha_range
+        child = self.new_individual(len(parent1.data))
         for i in range(len(parent1.data)):
             gene = child.data[i]
-            gene.data.clear()
             parent1_trays = parent1.data[i].data
             parent2_trays = parent2.data[i].data
             #max_number_of_elements = max(len(parent1.data[i].data), len(parent2.data[i].data))
             max_number_of_elements = max(len(parent1_trays), len(parent2_trays))
+            del gene.data[max_number_of_elements:]
+            while len(gene.data) < max_number_of_elements:
+                gene.data.append(Tray())
             for j in range(max_number_of_elements):
                 #tray1 = random.choice(parent1.data[i].data)
                 #tray2 = random.choice(parent2.data[i].data)
-                alpha = random.uniform(*alpha_range)
-                new_tray = None
+                alpha = self._random.uniform(*alpha_range)
+                new_tray = gene.data[j]
                 if j < len(parent1_trays) and j < len(parent2_trays):
                     tray1 = parent1_trays[j]
                     tray2 = parent2_trays[j]
-                    new_tray = Tray(
+                    new_tray.assign(
                         dim_x=max(1, round(alpha*tray1.dim_x + (1-alpha)*tray2.dim_x), 0),
                         dim_y=max(1, round(alpha*tray1.dim_y + (1-alpha)*tray2.dim_y), 0),
                         dim_z=max(1, round(alpha*tray1.dim_z + (1-alpha)*tray2.dim_z), 0),
                         x=max(0, round(alpha*tray1.x + (1-alpha)*tray2.x), 0),
                         y=max(0, round(alpha*tray1.y + (1-alpha)*tray2.y), 0),
                         z=max(0, round(alpha*tray1.z + (1-alpha)*tray2.z), 0),
-                        layer=tray1.layer  # Assuming the same layer, adjust as needed
+                        layer=tray1.layer,  # Assuming the same layer, adjust as needed
+                        orientation=tray1.orientation
                     )
                 elif j < len(parent1_trays):
-                    new_tray = parent1_trays[j]
+                    new_tray.assign(*parent1_trays[j].to_record())
                 else:
-                    new_tray = parent2_trays[j]
-                if new_tray is not None:
-                    gene.data.append(new_tray)
+                    new_tray.assign(*parent2_trays[j].to_record())
 
+        self.inherit_terms(child, parent1)
         return child
 
+    def new_individual(self, gene_count: int) -> Individual:
+        if len(self._spare_individuals) > 0:
+            individual = self._spare_individuals.pop()
+            if len(individual.data) == gene_count:
+                individual.mark_dirty()
+                return individual
+        return Individual(gene_count, self._max_number_of_elements)
+
+    def recycle(self, individuals: List[Individual]) -> None:
+        # individuals no longer referenced by the population become buffers for new children
+        self._spare_individuals.extend(individuals)
+
+    def inherit_terms(self, child: Individual, parent: Individual) -> None:
+        # start the child from the parent's fitness terms, only genes that differ from the parent are recomputed.
+        # Parents scored by evaluate_population in a batch have no terms, see there
+        if parent.terms is None:
+            return
+        parent_genome = parent.genome()
+        changed = [i for i, gene in enumerate(child.data)
+                   if tuple(el.to_record() for el in gene.data) != parent_genome[i]]
+        if 2 * len(changed) > len(child.data):
+            return
+        child.terms = parent.terms.copy()
+        for i in changed:
+            child.mark_dirty(i)
+        for i in parent.changed_genes:
+            child.mark_dirty(i)
+
     def one_point_crossover(self, parent1: Individual, parent2: Individual) -> Individual:
-        child = Individual(len(parent1.data))
+        child = Individual(len(parent1.data), self._max_number_of_elements)
 
-        crossover_point = random.randint(1, len(parent1.data[0].data) - 1)  # Assuming all genes have the same length
+        crossover_point = self._random.randint(1, len(parent1.data[0].data) - 1)  # Assuming all genes have the same length
 
         for i in range(len(parent1.data)):
-            child.data[i].data = parent1.data[i].data[:crossover_point] + parent2.data[i].data[crossover_point:]
+            child.data[i].data = [el.copy() for el in parent1.data[i].data[:crossover_point] + parent2.data[i].data[crossover_point:]]
 
         return child
 
     def crossover(self, parent1: Individual, parent2: Individual) -> Individual:
         return self.blended_crossover(parent1, parent2)
 
-    def mutate(self, individual: Individual) -> None:
-        gene = random.choice(individual.data)
-        rand = random.random()
+    def mutate(self, individual: Individual) -> int:
+        # returns the operator applied, NO_MUTATION when the individual was left as it is
+        gene_index = self._random.randrange(len(individual.data))
+        individual.mark_dirty(gene_index)
+        gene = individual.data[gene_index]
+        rand = self._random.random()
         if rand < self.mutation_rate:
-            element_to_mutate = random.choice(gene.data)
-            element_to_mutate.mutate()
+            element_to_mutate = self._random.choice(gene.data)
+            if self._layers > 1 and self._random.random() < self.mutation_rate_layer:
+                self.move_to_layer(element_to_mutate, (element_to_mutate.layer + self._random.randrange(1, self._layers)) % self._layers)
+            elif self._orientations > 1 and self._random.random() < self.mutation_rate_orientation:
+                element_to_mutate.orientation = 1 - element_to_mutate.orientation
+            else:
+                element_to_mutate.mutate(self.mutation_step, self._random)
+            return TRAY_MUTATION
         else:
             rand -= self.mutation_rate
             if gene.can_add_more_elements() and rand < self.mutation_rate_number_of_elements_up:
-                gene.data += [Tray.from_game(self._game)]
+                gene.data += [self.random_tray()]
+                return ADD_ELEMENT
                 # split the last tray in two
                 #last_element: Element = gene.data[len(gene.data)-1]
                 #last_element.dim_x = max(1, last_element.dim_x // 2)
@@ -331,19 +1025,47 @@ class Genetic:
                 rand -= self.mutation_rate_number_of_elements_up
                 if len(gene.data) > 1 and rand < self.mutation_rate_number_of_elements_down:
                     gene.data.pop()
+                    return REMOVE_ELEMENT
+        return NO_MUTATION
+
+    def random_tray(self) -> Tray:
+        return Tray.random(self._tables.layer_size, self._layers, self._orientations, self._random)
+
+    def move_to_layer(self, element: Element, layer: int) -> None:
+        layer_size_z = self._tables.layer_size[2]
+        element.layer = layer
+        element.z = layer * layer_size_z
+        element.dim_z = layer_size_z
 
     def repair_individual(self, individual: Individual) -> None:
-        max_x, max_y, max_z = self._game.bounding_box()
+        max_x, max_y, max_z = self._tables.bounding_box
+        if self._layers > 1:
+            # crossover blends z, trays are put back to fill their layer
+            layer_size_z = self._tables.layer_size[2]
+            for i, gene in enumerate(individual.data):
+                for element in gene.data:
+                    layer = min(max(element.layer, 0), self._layers - 1)
+                    if element.layer != layer or element.z != layer * layer_size_z or element.dim_z != layer_size_z:
+                        self.move_to_layer(element, layer)
+                        individual.mark_dirty(i)
         for i, gene in enumerate(individual.data):
             for j, element in enumerate(gene.data):
                 if element.dim_x + element.x > max_x:
                     element.dim_x = max(1, max_x - element.x)
+                    individual.mark_dirty(i)
                 if element.dim_y + element.y > max_y:
                     element.dim_y = max(1, max_y - element.y)
+                    individual.mark_dirty(i)
                 if element.dim_z + element.z > max_z:
                     element.dim_z = max(1, max_z - element.z)
+                    individual.mark_dirty(i)
 
         for i, gene in enumerate(individual.data):
+            if len(gene.data) < 2:
+                continue
+            # pairs are repaired one after another, only genes with an overlap need the pairwise pass
+            if len(candidate_pairs(*self.element_boxes(gene.data))) == 0:
+                continue
             for j, element in enumerate(gene.data):
                 for other_element in gene.data[j + 1:]:
                     if other_element.layer != element.layer:
@@ -357,124 +1079,483 @@ class Genetic:
                         other_element.dim_x = max(1, other_element.dim_y - overlap_y)
                     if overlap_z > 0:
                         other_element.dim_x = max(1, other_element.dim_z - overlap_z)
+                    individual.mark_dirty(i)
+
+        if self._repair_collisions:
+            self.repair_collisions(individual)
+
+    def repair_collisions(self, individual: Individual) -> None:
+        # Resolves overlaps between trays of different genes, for each overlapping pair in element order the
+        # later tray is cut back on the axis that loses it the least volume. Cuts only shrink trays, so the
+        # pairs found by the sweep before the first cut cover every overlap left
+        elements = [element for gene in individual.data for element in gene.data]
+        genes = [i for i, gene in enumerate(individual.data) for _ in gene.data]
+        for j, k in candidate_pairs(*self.element_boxes(elements)):
+            if genes[j] == genes[k]:
+                continue
+            element, other = elements[j], elements[k]
+            if element.layer != other.layer or element.get_overlap(other) == 0:
+                continue
+            start, end = (element.x, element.y, element.z), (element.x + element.dim_x, element.y + element.dim_y, element.z + element.dim_z)
+            other_start, other_size = [other.x, other.y, other.z], [other.dim_x, other.dim_y, other.dim_z]
+            best = None
+            for axis in range(3):
+                if other_start[axis] >= start[axis]:
+                    new_start, new_size = end[axis], other_start[axis] + other_size[axis] - end[axis]
+                else:
+                    new_start, new_size = other_start[axis], start[axis] - other_start[axis]
+                if new_size < 1:
+                    continue
+                lost = (other_size[axis] - new_size) * other_size[(axis + 1) % 3] * other_size[(axis + 2) % 3]
+                if best is None or lost < best[0]:
+                    best = (lost, axis, new_start, new_size)
+            if best is None:
+                continue
+            _, axis, other_start[axis], other_size[axis] = best
+            other.x, other.y, other.z = other_start
+            other.dim_x, other.dim_y, other.dim_z = other_size
+            individual.mark_dirty(genes[k])
+
+
+    def compute_fitness_array(self, arrays: PopulationArray = None, pool: 'FitnessPool' = None):
+        # Same penalties as compute_fitness, evaluated for every individual of the array at once
+        if arrays is None:
+            # only rows without a fitness are evaluated, elites keep the fitness of the previous generation
+            if self._fitness is None:
+                self._fitness = np.full(self._arrays.population_size, np.nan)
+                self._fitness_ex = np.zeros((self._arrays.population_size, 4))
+            dirty = np.flatnonzero(np.isnan(self._fitness))
+            if len(dirty) > 0 and pool is not None:
+                self._fitness[dirty], self._fitness_ex[dirty] = pool.evaluate_array(self._arrays, dirty)
+            elif len(dirty) > 0:
+                self._fitness[dirty], self._fitness_ex[dirty] = self.compute_fitness_array(self._arrays.take(dirty))
+            return self._fitness
+
+        data, mask = arrays.data, arrays.mask
+        population_size, gene_count, _, _ = data.shape
+        self.evaluations += population_size
+        valid = mask.astype(np.int64)
+        dim_x, dim_y, dim_z = data[..., DIM_X], data[..., DIM_Y], data[..., DIM_Z]
+        x, y, z, layer = data[..., X], data[..., Y], data[..., Z], data[..., LAYER]
+
+        number_of_elements = valid.sum(axis=(1, 2))
+        min_number_of_elements = gene_count
+        max_x, max_y, max_z = self._tables.bounding_box
+        if self._orientations > 1:
+            # the space each tray needs in its orientation, (individual, gene, slot, axis)
+            required = self._tables.required_array[np.arange(gene_count)[:, None], data[..., ORIENTATION]]
+        else:
+            required = self._tables.required_array[None, :, :1]
+        required_x, required_y, required_z = required[..., 0], required[..., 1], required[..., 2]
+
+        at_least_x, at_least_y, at_least_z = np.maximum(1, dim_x), np.maximum(1, dim_y), np.maximum(1, dim_z)
+
+        # stacking is in y direction
+        stacked_y = (dim_y * valid).sum(axis=2, keepdims=True)
+        unfit_x = (np.maximum(0, required_x - dim_x) * at_least_y * at_least_z * valid).sum(axis=2)
+        unfit_y = (np.maximum(0, required_y - stacked_y) * at_least_x * at_least_z * valid).sum(axis=2)
+        unfit_z = (np.maximum(0, required_z - dim_z) * at_least_x * at_least_y * valid).sum(axis=2)
+
+        overfit_x = (np.maximum(0, dim_x + x - max_x) * at_least_y * at_least_z * valid).sum(axis=2)
+        overfit_y = (np.maximum(0, dim_y + y - max_y) * at_least_x * at_least_z * valid).sum(axis=2)
+        overfit_z = (np.maximum(0, dim_z + z - max_z) * at_least_x * at_least_y * valid).sum(axis=2)
+
+        unfit_penalty = self._gene_penalty_array(unfit_x, unfit_y, unfit_z).sum(axis=1)
+        overfit_penalty = self._gene_penalty_array(overfit_x, overfit_y, overfit_z).sum(axis=1)
+
+        # overlaps between every pair of elements of an individual on the same layer
+        flat = data.reshape(population_size, -1, data.shape[-1])
+        _, layer_overlaps = overlap_matrix(flat[..., X:Z + 1], flat[..., DIM_X:DIM_Z + 1], flat[..., LAYER],
+                                           mask.reshape(population_size, -1), len(self._total_space))
+        overlap_penalty = layer_overlaps.sum(axis=1)
+
+        unused_space = np.empty((population_size, len(self._total_space)), dtype=np.int64)
+        volume = dim_x * dim_y * dim_z * valid
+        for l, total_space in enumerate(self._total_space):
+            unused_space[:, l] = total_space - (volume * (layer == l)).sum(axis=(1, 2)) + layer_overlaps[:, l]
+        unused_space = np.abs(unused_space).sum(axis=1)
+
+        fitness = ((self._unused_space_factor * unused_space
+                   + self._unfit_factor * np.abs(unfit_penalty))
+                   + self._overlap_factor * np.abs(overlap_penalty)
+                   + self._overfit_factor * np.abs(overfit_penalty))
+        fitness = fitness / self._tables.fitness_scale
+        fitness = fitness + self._number_of_elements_factor * (number_of_elements - min_number_of_elements) / gene_count / 100
+        fitness = -fitness
+
+        fitness_ex = np.stack([unused_space, unfit_penalty, overlap_penalty, overfit_penalty], axis=1)
+        return fitness, fitness_ex
 
+    @staticmethod
+    def _gene_penalty_array(penalty_x, penalty_y, penalty_z):
+        # products are taken in floating point as they can exceed the int64 range
+        penalty = (np.maximum(1, penalty_x).astype(np.float64) * np.maximum(1, penalty_y)
+                   * np.maximum(1, penalty_z))
+        return np.where((penalty_x > 0) | (penalty_y > 0) | (penalty_z > 0), penalty, 0.0)
+
+    def select_array(self, count: int):
+        # tournaments are drawn with replacement, which for tournament sizes far below
+        # the population size is equivalent to random.sample
+        fitness = self.compute_fitness_array()
+        tournaments = self._rng.integers(0, len(fitness), size=(count, self._tournament_size))
+        return tournaments[np.arange(count), np.argmax(fitness[tournaments], axis=1)]
+
+    def random_trays_array(self, count: int):
+        layer_size_x, layer_size_y, layer_size_z = self._tables.layer_size
+        trays = np.zeros((count, len(Tray().to_record())), dtype=np.int64)
+        trays[:, X] = self._rng.integers(0, layer_size_x, size=count)
+        trays[:, Y] = self._rng.integers(0, layer_size_y, size=count)
+        trays[:, DIM_X] = self._rng.integers(1, layer_size_x - trays[:, X] + 2)
+        trays[:, DIM_Y] = self._rng.integers(1, layer_size_y - trays[:, Y] + 2)
+        trays[:, DIM_Z] = layer_size_z
+        if self._layers > 1:
+            trays[:, LAYER] = self._rng.integers(0, self._layers, size=count)
+            trays[:, Z] = trays[:, LAYER] * layer_size_z
+        if self._orientations > 1:
+            trays[:, ORIENTATION] = self._rng.integers(0, self._orientations, size=count)
+        return trays
+
+    def blended_crossover_array(self, parents1: PopulationArray, parents2: PopulationArray, alpha_range=None) -> PopulationArray:
+        alpha_range = alpha_range if alpha_range is not None else self.alpha_range
+        data1, data2 = parents1.data, parents2.data
+        alpha = self._rng.uniform(*alpha_range, size=data1.shape[:3] + (1,))
+        blended = np.rint(alpha * data1 + (1 - alpha) * data2).astype(np.int64)
+        blended[..., DIM_X:DIM_Z + 1] = np.maximum(1, blended[..., DIM_X:DIM_Z + 1])
+        blended[..., X:Z + 1] = np.maximum(0, blended[..., X:Z + 1])
+        blended[..., LAYER] = data1[..., LAYER]
+        blended[..., ORIENTATION] = data1[..., ORIENTATION]
+
+        both = (parents1.mask & parents2.mask)[..., None]
+        return PopulationArray.from_arrays(np.where(both, blended, np.where(parents1.mask[..., None], data1, data2)),
+                                           parents1.mask | parents2.mask)
+
+    def mutate_array(self, arrays: PopulationArray):
+        # returns the operator applied to each row as in mutate
+        data, mask = arrays.data, arrays.mask
+        count = arrays.population_size
+        rows = np.arange(count)
+        genes = self._rng.integers(0, arrays.gene_count, size=count)
+        number_of_elements = mask[rows, genes].sum(axis=1)
+        rand = self._rng.random(count)
+
+        # mutate a single parameter of a random element of the gene
+        mutated = rand < self.mutation_rate
+        slots = (self._rng.random(count) * number_of_elements).astype(np.int64)
+        choice = self._rng.integers(0, ORIENTATION, size=count)
+        k = self._rng.integers(1, self.mutation_step + 1, size=count) * self._rng.choice([-1, 1], size=count)
+        changed = mutated
+        if self._layers > 1:
+            # some of the mutated trays move to another layer instead, repair puts them at its height
+            moved = mutated & (self._rng.random(count) < self.mutation_rate_layer)
+            changed = mutated & ~moved
+            r, g, s = rows[moved], genes[moved], slots[moved]
+            data[r, g, s, LAYER] = (data[r, g, s, LAYER] + self._rng.integers(1, self._layers, size=len(r))) % self._layers
+        if self._orientations > 1:
+            turned = changed & (self._rng.random(count) < self.mutation_rate_orientation)
+            changed = changed & ~turned
+            r, g, s = rows[turned], genes[turned], slots[turned]
+            data[r, g, s, ORIENTATION] = 1 - data[r, g, s, ORIENTATION]
+        for param, lowest in ((DIM_X, 1), (DIM_Y, 1), (X, 0), (Y, 0)):
+            selected = changed & (choice == param)
+            r, g, s = rows[selected], genes[selected], slots[selected]
+            data[r, g, s, param] = np.maximum(lowest, data[r, g, s, param] + k[selected])
+
+        # add a random element to the gene
+        rand -= self.mutation_rate
+        added = ~mutated & (number_of_elements < arrays.max_number_of_elements) & (rand < self.mutation_rate_number_of_elements_up)
+        r, g, s = rows[added], genes[added], number_of_elements[added]
+        data[r, g, s] = self.random_trays_array(len(r))
+        mask[r, g, s] = True
+
+        # remove the last element of the gene
+        rand -= self.mutation_rate_number_of_elements_up
+        removed = ~mutated & ~added & (number_of_elements > 1) & (rand < self.mutation_rate_number_of_elements_down)
+        r, g, s = rows[removed], genes[removed], number_of_elements[removed] - 1
+        data[r, g, s] = 0
+        mask[r, g, s] = False
+
+        operators = np.full(count, NO_MUTATION)
+        operators[mutated] = TRAY_MUTATION
+        operators[added] = ADD_ELEMENT
+        operators[removed] = REMOVE_ELEMENT
+        return operators
+
+    def repair_array(self, arrays: PopulationArray) -> None:
+        data, mask = arrays.data, arrays.mask
+        max_x, max_y, max_z = self._tables.bounding_box
+        if self._layers > 1:
+            layer_size_z = self._tables.layer_size[2]
+            data[..., LAYER] = np.clip(data[..., LAYER], 0, self._layers - 1)
+            data[..., Z] = data[..., LAYER] * layer_size_z
+            data[..., DIM_Z] = layer_size_z
+            data[~mask] = 0
+        for dim, pos, limit in ((DIM_X, X, max_x), (DIM_Y, Y, max_y), (DIM_Z, Z, max_z)):
+            outside = data[..., dim] + data[..., pos] > limit
+            data[..., dim] = np.where(outside, np.maximum(1, limit - data[..., pos]), data[..., dim])
+
+        # pairs are repaired one after another, as in repair_individual
+        for j in range(arrays.max_number_of_elements):
+            for k in range(j + 1, arrays.max_number_of_elements):
+                element, other = data[:, :, j], data[:, :, k]
+                pair = data[:, :, [j, k]]
+                overlap = overlap_extents(pair[..., X:Z + 1], pair[..., DIM_X:DIM_Z + 1])[..., 0, 1, :]
+                overlapping = (mask[:, :, j] & mask[:, :, k] & (element[..., LAYER] == other[..., LAYER])
+                               & (overlap.prod(axis=-1) != 0))
+                for axis, dim in enumerate((DIM_X, DIM_Y, DIM_Z)):
+                    other[..., DIM_X] = np.where(overlapping, np.maximum(1, other[..., dim] - overlap[..., axis]), other[..., DIM_X])
+
+        if self._repair_collisions:
+            self.repair_collisions_array(arrays)
+
+    def repair_collisions_array(self, arrays: PopulationArray) -> None:
+        # Same cuts as repair_collisions for every individual at once, pairs that do not overlap in any
+        # individual before the first cut are skipped
+        population_size, gene_count, slots, params = arrays.data.shape
+        data = arrays.data.reshape(population_size, gene_count * slots, params)
+        mask = arrays.mask.reshape(population_size, gene_count * slots)
+        genes = np.repeat(np.arange(gene_count), slots)
+        volume, _ = overlap_matrix(data[..., X:Z + 1], data[..., DIM_X:DIM_Z + 1], data[..., LAYER], mask,
+                                   int(data[..., LAYER].max()) + 1 if data.size > 0 else 1)
+        candidates = (volume > 0).any(axis=0) & (genes[:, None] != genes[None, :])
+        for j, k in np.argwhere(candidates):
+            element, other = data[:, j], data[:, k]
+            start, end = element[:, X:Z + 1], element[:, X:Z + 1] + element[:, DIM_X:DIM_Z + 1]
+            other_start, other_size = other[:, X:Z + 1], other[:, DIM_X:DIM_Z + 1]
+            overlap = np.maximum(0, np.minimum(end, other_start + other_size) - np.maximum(start, other_start))
+            overlapping = (mask[:, j] & mask[:, k] & (element[:, LAYER] == other[:, LAYER]) & (overlap.prod(axis=1) > 0))
+            if not overlapping.any():
+                continue
+
+            front = other_start >= start
+            new_start = np.where(front, end, other_start)
+            new_size = np.where(front, other_start + other_size - end, start - other_start)
+            area = np.stack([other_size[:, 1] * other_size[:, 2], other_size[:, 2] * other_size[:, 0],
+                             other_size[:, 0] * other_size[:, 1]], axis=1)
+            lost = np.where(new_size >= 1, (other_size - new_size) * area, np.iinfo(np.int64).max)
+            axis = np.argmin(lost, axis=1)
+            rows = np.flatnonzero(overlapping & (new_size >= 1).any(axis=1))
+            data[rows, k, X + axis[rows]] = new_start[rows, axis[rows]]
+            data[rows, k, DIM_X + axis[rows]] = new_size[rows, axis[rows]]
+
+    def run_generation_array(self, pool: 'FitnessPool' = None) -> PopulationArray:
+        num_elites = max(1, int(self._population_size * 0.06))
+        fitness = self.compute_fitness_array(pool=pool)
+        self.credit_offspring(fitness.tolist())
+        sorted_indices = np.argsort(-fitness, kind='stable')
+        elites = self._arrays.take(sorted_indices[:num_elites])
+
+        num_pairs = (self._population_size - num_elites) // 2
+        parents = self.select_array(2 * num_pairs)
+        parents1 = self._arrays.take(np.repeat(parents[0::2], 2))
+        parents2 = self._arrays.take(np.repeat(parents[1::2], 2))
+        children = self.blended_crossover_array(parents1, parents2)
+        operators = self.mutate_array(children)
+        self.repair_array(children)
+        if self.adaptation is not None:
+            count = self._population_size - num_elites
+            parent_fitness = np.repeat(np.maximum(fitness[parents[0::2]], fitness[parents[1::2]]), 2)
+            self._offspring = {'start': num_elites, 'operators': operators[:count].tolist(),
+                               'parent_fitness': parent_fitness[:count].tolist()}
+
+        elites_fitness, elites_fitness_ex = fitness[sorted_indices[:num_elites]], self._fitness_ex[sorted_indices[:num_elites]]
+        if self.local_search is not None and self.local_search.due(self.generation):
+            elites, elites_fitness, elites_fitness_ex = self.local_search.refine_array(self, elites, elites_fitness,
+                                                                                      elites_fitness_ex, pool)
+
+        self._arrays = PopulationArray.concatenate([elites, children]).take(slice(0, self._population_size))
+        if pool is not None:
+            self._arrays = pool.share(self._arrays)
+        self._fitness = np.concatenate([elites_fitness, np.full(children.population_size, np.nan)])[:self._population_size]
+        self._fitness_ex = np.concatenate([elites_fitness_ex, np.zeros((children.population_size, 4))])[:self._population_size]
+        if pool is not None:
+            # the children are scored in the workers as in object mode, best() would score them in this process
+            self.compute_fitness_array(pool=pool)
+        return self._arrays
+
+    def run_generation(self, pool: 'FitnessPool' = None) -> List[Individual]:
+        # With a pool the fitness of the population is computed in the worker processes,
+        # selection and the genetic operators stay in this process
+        self.generation += 1
+        if self._vectorized:
+            self.run_generation_array(pool)
+            return self.population
 
-    def run_generation(self, pool: mp.Pool = None) -> List[Individual]:
         # Determine the number of elite individuals to carry over
         num_elites = max(1, int(self._population_size * 0.06))  # For example, 6% of the population
 
         # Sort the current population based on fitness and select the top individuals
         if pool is not None:
-            fitness_scores = pool.map(self.compute_fitness, self.population)
-            sorted_population = [x for _, x in sorted(zip(fitness_scores, self.population), key=lambda x:x[0], reverse=True)]
+            pool.evaluate(self.population)
         else:
-            sorted_population = sorted(self.population, key=self.compute_fitness, reverse=True)
+            self.evaluate_population()
+        self.credit_offspring([ind.fitness for ind in self.population])
+        sorted_population = sorted(self.population, key=self.compute_fitness, reverse=True)
         elites = sorted_population[:num_elites]
+        if self.local_search is not None and self.local_search.due(self.generation):
+            elites = self.local_search.refine(self, elites, pool)
 
         # Prepare the new population starting with the elites
         new_population = elites[:]
 
         # Generate the rest of the new population
-        if pool is not None:
-            tasks = []
-            for _ in range((self._population_size - num_elites) // 2):
-                parent1, parent2 = self.select(), self.select()
-                tasks.append((parent1, parent2))
-
-            results = pool.starmap(self.perform_crossover_and_mutation, tasks)
-            for res in results:
-                child1, child2 = res
-                self.repair_individual(child1)
-                self.repair_individual(child2)
-                new_population.extend([child1, child2])
-        else:
-            #parents = self.select_distinct((self._population_size - num_elites) // 2)
-            for _ in range((self._population_size - num_elites) // 2):
-                parent1, parent2 = self.select(), self.select()
-                child1 = self.crossover(parent1, parent2)
-                child2 = self.crossover(parent1, parent2)
-                self.mutate(child1)
-                self.mutate(child2)
-                self.repair_individual(child1)
-                self.repair_individual(child2)
-                new_population.extend([child1, child2])
+        #parents = self.select_distinct((self._population_size - num_elites) // 2)
+        operators = []
+        parent_fitness = []
+        for _ in range((self._population_size - num_elites) // 2):
+            parent1, parent2 = self.select(), self.select()
+            child1 = self.crossover(parent1, parent2)
+            child2 = self.crossover(parent1, parent2)
+            operators.append(self.mutate(child1))
+            operators.append(self.mutate(child2))
+            self.repair_individual(child1)
+            self.repair_individual(child2)
+            new_population.extend([child1, child2])
+            parent_fitness.extend([max(parent1.fitness, parent2.fitness)] * 2)
 
         # Adjust the population size in case of rounding errors
         new_population = new_population[:self._population_size]
+        if self.adaptation is not None:
+            count = len(new_population) - len(elites)
+            self._offspring = {'start': len(elites), 'operators': operators[:count], 'parent_fitness': parent_fitness[:count]}
+        if pool is not None:
+            pool.evaluate(new_population)
+
+        # individuals that did not make it into the new population are reused for the next children,
+        # callers must copy an individual of an older generation to keep it
+        kept = set(map(id, new_population))
+        self.recycle([ind for ind in self.population if id(ind) not in kept])
 
         # Update the global population list
         self.population = new_population
         return new_population
 
-    def perform_crossover_and_mutation(self, parent1, parent2):
-        child1 = self.crossover(parent1, parent2)
-        child2 = self.crossover(parent1, parent2)
-        self.mutate(child1)
-        self.mutate(child2)
-        return child1, child2
+    def run(self, termination: Termination = None, pool: 'FitnessPool' = None, report_interval: int = 10,
+            checkpoint: 'Checkpointer' = None) -> Individual:
+        # Evolves until the termination stops the run, by default after 3000 generations, 100 generations
+        # without improvement or a perfect fitness. termination_reason holds the criterion that stopped it.
+        # A checkpointer is given every generation and saves the final state of the run
+        termination = termination if termination is not None else default_termination()
+        termination.reset(self)
+        while True:
+            self.run_generation(pool)
+            winner = self.best()
+            if report_interval > 0 and self.generation % report_interval == 0:
+                print(f"Generation {self.generation} fitness: {winner.fitness}")
+            if termination.should_stop(self, winner):
+                break
+            if checkpoint is not None:
+                checkpoint(self)
+        self.termination_reason = termination.reason
+        if checkpoint is not None:
+            checkpoint.save(self)
+            checkpoint.flush()
+        return winner
 
 def individual_to_trays(individual: Individual):
     all_elements = []
-    for gene in individual.data:
+    for i, gene in enumerate(individual.data):
         for el in gene.data:
             if el is not None:
                 tray = {}
+                tray['gene'] = i
                 tray['x'] = el.x / 10
                 tray['y'] = el.y / 10
                 tray['z'] = el.z / 10
                 tray['Length'] = el.dim_y / 10
                 tray['Width'] = el.dim_x / 10
                 tray['Height'] = el.dim_z / 10
+                tray['orientation'] = el.orientation
 
                 all_elements.append(tray)
 
     return all_elements
 
+def display_individual(individual: Individual) -> None:
+    for gene in individual.data:
+        for el in gene.data:
+            if el is not None:
+                el.display()
 
-def create_etherfields():
-    card = Card(88, 63, 1)
-    tile = Card(100, 100, 1)
-    game = Game(300, 300, 120)
-    game.add_items(card, 100)
-    game.add_items(tile, 100)
 
-    #pool = mp.Pool(8)
+def create_etherfields(workers: int = 0, profile: str = None, termination: Termination = None, checkpoint: str = None,
+                       layouts: List[List[dict]] = None, layouts_bounding_box: tuple = None, cache: str = None,
+                       fast: bool = False):
+    game = etherfields_game()
+
+    if fast:
+        # constructive layout only, without the genetic search
+        try:
+            from .Packer import create_packed_layout
+        except:
+            from Packer import create_packed_layout
+        return create_packed_layout(game)
+
+    population_size = 200
+    factors = (0, 0.1, 1, 1, 1)
+    solutions = None
+    if cache is not None:
+        # the layout of an earlier run of the same game and parameters is returned without running the solver
+        try:
+            from .SolutionCache import SolutionCache
+        except:
+            from SolutionCache import SolutionCache
+        solutions = SolutionCache(cache)
+        key = SolutionCache.key(game, {'population_size': population_size, 'factors': factors,
+                                       'termination': termination})
+        trays = solutions.get(key)
+        if trays is not None:
+            return trays
+
+    genetic = Genetic(game, population_size, *factors, vectorized=np is not None)
+    genetic.pack_start()
+    if layouts is not None:
+        # earlier winners, e.g. of the same game with other card counts, seed half of the population
+        genetic.warm_start(layouts, 0.5, layouts_bounding_box)
     pool = None
-
-    genetic = Genetic(game, 200, 0, 0.1, 1, 1, 1)
-    winner = None
-    min_fitness = None
-    fitness_loop = 0
-    max_fitness_loop = 100
-    for i in range(0, 3000):
-        population = genetic.run_generation(pool)
+    if workers > 0:
+        # imported here as the parallel module depends on this one
+        try:
+            from .Parallel import FitnessPool
+        except:
+            from Parallel import FitnessPool
+        pool = FitnessPool(genetic, workers)
+    checkpointer = None
+    if checkpoint is not None:
+        # the run is saved to the checkpoint file every 10 generations and continues from it when it exists
+        try:
+            from .Checkpoint import Checkpointer, load_checkpoint
+        except:
+            from Checkpoint import Checkpointer, load_checkpoint
+        if os.path.exists(checkpoint):
+            load_checkpoint(genetic, checkpoint)
+        checkpointer = Checkpointer(checkpoint)
+    profiler = writer = None
+    if profile is not None:
+        # per generation phase timings are written to the given CSV or JSON lines file
+        try:
+            from .Profiling import Profiler, stats_writer
+        except:
+            from Profiling import Profiler, stats_writer
+        writer = stats_writer(profile)
+        profiler = Profiler([writer])
+        profiler.attach(genetic, pool)
+    try:
+        winner = genetic.run(termination, pool, checkpoint=checkpointer)
+    finally:
+        if checkpointer is not None:
+            checkpointer.close()
+        if profiler is not None:
+            profiler.detach()
+            writer.close()
         if pool is not None:
-            fitness_scores = pool.map(genetic.compute_fitness, genetic.population)
-            fitness, winner = max(zip(fitness_scores, population), key=lambda x: x[0])
-            winner.fitness = fitness
-        else:
-            winner = max(population, key=genetic.compute_fitness)
-            if winner.fitness == min_fitness:
-                fitness_loop += 1
-            else:
-                fitness_loop = 0
-
-            if min_fitness is None or min_fitness > winner.fitness:
-                min_fitness = winner.fitness
-            if fitness_loop >= max_fitness_loop:
-                break
+            pool.close()
 
-        if i % 10 == 0:
-            print(f"Generation {i} fitness: {winner.fitness}")
-        if winner.fitness == 0:
-            break
-    
-    for gene in winner.data:
-        for el in gene.data:
-            if el is not None:
-                el.display()
+    display_individual(winner)
 
-    return individual_to_trays(winner)
+    trays = individual_to_trays(winner)
+    if solutions is not None:
+        solutions.put(key, trays, winner.fitness)
+    return trays
 
 
 if __name__ == '__main__':
@@ -484,36 +1565,16 @@ if __name__ == '__main__':
     game.add_items(card, 100)
     game.add_items(tile, 100)
 
-    #pool = mp.Pool(16)
-    pool = None
     total_time = -time.time()
 
     genetic = Genetic(game, 100, 0, 1, 1, 1, 1)
-    winner = None
-    max_fitness = None
-    fitness_loop = 0
-    max_fitness_loop = 100
-
-    for i in range(0, 10000):
-        population = genetic.run_generation(pool)
-        if pool is not None:
-            fitness_scores = pool.map(genetic.compute_fitness, genetic.population)
-            fitness, winner = max(zip(fitness_scores, population), key=lambda x: x[0])
-            winner.fitness = fitness
-        else:
-            winner = max(population, key=genetic.compute_fitness)
-
-        print(f"Generation {i} fitness: {winner.fitness}")
-        if winner.fitness == max_fitness:
-            fitness_loop += 1
-        else:
-            fitness_loop = 0
-
-        if max_fitness is None or winner.fitness > max_fitness:
-            max_fitness = winner.fitness
+    #from Parallel import FitnessPool
+    #pool = FitnessPool(genetic, 16)
+    pool = None
+    winner = genetic.run(Termination(MaxGenerations(10000), Stagnation(100), TargetFitness(0.0)), pool, report_interval=1)
 
-        if fitness_loop >= max_fitness_loop or genetic.compute_fitness(winner) == 0:
-            break
+    if pool is not None:
+        pool.close()
 
     for gene in winner.data:
         for el in gene.data:
@@ -0,0 +1,149 @@
+from typing import List
+try:
+    from .Game import Game, etherfields_game
+    from .Genetic import Genetic, Individual, individual_to_trays, display_individual, np
+    from .Termination import Termination, MaxGenerations, TargetFitness
+except:
+    from Game import Game, etherfields_game
+    from Genetic import Genetic, Individual, individual_to_trays, display_individual, np
+    from Termination import Termination, MaxGenerations, TargetFitness
+
+import multiprocessing as mp
+
+# Every island is a separate process evolving its own Genetic population, the model only
+# exchanges commands and genomes with the islands over pipes
+def _island_main(connection, context: dict, population_size: int, vectorized: bool, seed: int) -> None:
+    # without a seed every island draws from its own freshly seeded generators
+    genetic = Genetic.from_context(context, population_size, vectorized=vectorized, seed=seed)
+    while True:
+        command, argument = connection.recv()
+        if command == 'evolve':
+            for _ in range(argument):
+                genetic.run_generation()
+            best = genetic.best()
+            connection.send((best.genome(), best.fitness, best.fitness_ex, genetic.evaluations))
+        elif command == 'emigrants':
+            connection.send(genetic.top_genomes(argument))
+        elif command == 'immigrants':
+            genetic.replace_worst(argument)
+        elif command == 'diversity':
+            connection.send(genetic.diversity())
+        elif command == 'stop':
+            break
+    connection.close()
+
+class IslandModel:
+    TOPOLOGIES = ('ring', 'all')
+
+    def __init__(self, game: Game, population_size: int, number_of_elements_factor: float, unused_space_factor: float,
+                 unfit_factor: float, overlap_factor: float, overfit_factor: float, islands: int = 4,
+                 migration_interval: int = 10, migration_size: int = 2, topology: str = 'ring',
+                 vectorized: bool = False, max_number_of_elements: int = 1, seed: int = None) -> None:
+        # Runs a Genetic population of the given size on each island, every migration_interval generations
+        # the top migration_size individuals of each island replace the worst of its neighbours in the ring
+        # or of every other island for the all-to-all topology
+        if topology not in self.TOPOLOGIES:
+            raise ValueError(f"Unknown topology {topology}, expected one of {self.TOPOLOGIES}")
+        self._migration_interval = migration_interval
+        self._migration_size = migration_size
+        self._topology = topology
+        self._genetic = Genetic(game, 0, number_of_elements_factor, unused_space_factor, unfit_factor, overlap_factor,
+                                overfit_factor, max_number_of_elements=max_number_of_elements)
+        self._context = self._genetic.context()
+        self.generation = 0
+        self.best: Individual = None
+        self._evaluations = [0] * islands
+        self.termination_reason = None
+
+        self._connections = []
+        self._processes = []
+        for i in range(islands):
+            parent_connection, child_connection = mp.Pipe()
+            island_seed = seed + i if seed is not None else None
+            process = mp.Process(target=_island_main, daemon=True,
+                                 args=(child_connection, self._context, population_size, vectorized, island_seed))
+            process.start()
+            child_connection.close()
+            self._connections.append(parent_connection)
+            self._processes.append(process)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    @property
+    def islands(self) -> int:
+        return len(self._connections)
+
+    @property
+    def evaluations(self) -> int:
+        return sum(self._evaluations)
+
+    def diversity(self) -> float:
+        # mean diversity of the islands, migration keeps the islands from converging to the same layout
+        for connection in self._connections:
+            connection.send(('diversity', None))
+        return sum(connection.recv() for connection in self._connections) / self.islands
+
+    def close(self) -> None:
+        for connection, process in zip(self._connections, self._processes):
+            try:
+                connection.send(('stop', None))
+            except (BrokenPipeError, OSError):
+                pass
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+            connection.close()
+        self._connections = []
+        self._processes = []
+
+    def evolve(self, generations: int) -> Individual:
+        # all islands evolve at the same time, the best individual over all islands is kept
+        for connection in self._connections:
+            connection.send(('evolve', generations))
+        for i, connection in enumerate(self._connections):
+            genome, fitness, fitness_ex, self._evaluations[i] = connection.recv()
+            if self.best is None or fitness > self.best.fitness:
+                self.best = self._genetic.individual_from_genome(genome)
+                self.best.fitness, self.best.fitness_ex = fitness, fitness_ex
+                self.best.dirty = False
+        self.generation += generations
+        return self.best
+
+    def migrate(self) -> None:
+        for connection in self._connections:
+            connection.send(('emigrants', self._migration_size))
+        emigrants: List[List[tuple]] = [connection.recv() for connection in self._connections]
+
+        for i, connection in enumerate(self._connections):
+            if self._topology == 'ring':
+                immigrants = emigrants[i - 1]
+            else:
+                immigrants = [genome for j, genomes in enumerate(emigrants) if j != i for genome in genomes]
+            connection.send(('immigrants', immigrants))
+
+    def run(self, generations: int, report: bool = True, termination: Termination = None) -> Individual:
+        # the termination is checked after every migration interval, the run always stops after generations
+        termination = Termination(MaxGenerations(generations - self.generation), termination if termination is not None else TargetFitness(0.0))
+        termination.reset(self)
+        while True:
+            self.evolve(min(self._migration_interval, generations - self.generation))
+            if report:
+                print(f"Generation {self.generation} fitness: {self.best.fitness}")
+            if termination.should_stop(self, self.best):
+                break
+            if self.islands > 1:
+                self.migrate()
+        self.termination_reason = termination.reason
+        return self.best
+
+def create_etherfields_islands(islands: int = 4, generations: int = 3000):
+    with IslandModel(etherfields_game(), 200, 0, 0.1, 1, 1, 1, islands=islands, vectorized=np is not None) as model:
+        winner = model.run(generations)
+
+    display_individual(winner)
+
+    return individual_to_trays(winner)
@@ -0,0 +1,92 @@
+from typing import List
+try:
+    from .Genetic import Individual
+    from .PopulationArray import PopulationArray, DIM_X, DIM_Y, X, Y, np
+except:
+    from Genetic import Individual
+    from PopulationArray import PopulationArray, DIM_X, DIM_Y, X, Y, np
+
+# Moves of a tray as changes of (x, y, dim_x, dim_y) per unit of the step: shifting the tray in x and y
+# and moving one of its four sides while the opposite side stays in place
+MOVES = ((1, 0, 0, 0), (0, 1, 0, 0), (0, 0, 1, 0), (0, 0, 0, 1), (1, 0, -1, 0), (0, 1, 0, -1))
+
+class PatternSearch:
+    # Memetic refinement of the elites, given to Genetic as local_search. Every interval generations each
+    # elite is improved by a pattern search: all moves of one tray by the current step in either direction
+    # are repaired and scored, the best move is taken when it improves the fitness, otherwise the step of
+    # that elite is halved. The moves of all elites are scored in one batch, with a pool in its worker
+    # processes. The search is deterministic and does not draw random numbers
+
+    def __init__(self, interval: int = 5, iterations: int = 20, step: int = 8) -> None:
+        if np is None:
+            raise ImportError("numpy is required for the local search")
+        self.interval = interval
+        self.iterations = iterations
+        self.step = step
+
+    def due(self, generation: int) -> bool:
+        return self.interval > 0 and generation % self.interval == 0
+
+    def refine_array(self, genetic, arrays: PopulationArray, fitness, fitness_ex, pool: 'FitnessPool' = None) -> tuple:
+        # Returns the refined arrays with their fitness and fitness_ex, the given ones are not changed
+        data, mask = arrays.data.copy(), arrays.mask.copy()
+        fitness, fitness_ex = np.array(fitness, dtype=np.float64), np.array(fitness_ex, dtype=np.float64)
+        # copies of the same elite are refined once
+        keys = np.concatenate([data.reshape(len(data), -1), mask.reshape(len(mask), -1)], axis=1)
+        _, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        steps = np.zeros(arrays.population_size, dtype=np.int64)
+        steps[first] = self.step
+        params = [X, Y, DIM_X, DIM_Y]
+        directions = np.array(MOVES + tuple(tuple(-d for d in move) for move in MOVES), dtype=np.int64)
+        for _ in range(self.iterations):
+            rows = np.flatnonzero(steps >= 1)
+            if len(rows) == 0:
+                break
+            # one candidate per elite, tray and move in either direction, ordered by elite
+            owner, gene, slot = np.nonzero(mask[rows])
+            moves = len(directions)
+            owner, gene, slot = np.repeat(owner, moves), np.repeat(gene, moves), np.repeat(slot, moves)
+            move = directions[np.tile(np.arange(moves), len(owner) // moves)] * steps[rows[owner]][:, None]
+
+            candidates = PopulationArray.from_arrays(data[rows[owner]], mask[rows[owner]])
+            index = np.arange(len(owner))[:, None]
+            trays = candidates.data[index, gene[:, None], slot[:, None], params] + move
+            trays[:, :2] = np.maximum(0, trays[:, :2])
+            trays[:, 2:] = np.maximum(1, trays[:, 2:])
+            candidates.data[index, gene[:, None], slot[:, None], params] = trays
+            genetic.repair_array(candidates)
+            if pool is not None:
+                candidate_fitness, candidate_fitness_ex = pool.evaluate_array(candidates)
+            else:
+                candidate_fitness, candidate_fitness_ex = genetic.compute_fitness_array(candidates)
+
+            starts = np.searchsorted(owner, np.arange(len(rows)))
+            ends = np.append(starts[1:], len(owner))
+            for i, row in enumerate(rows):
+                if starts[i] == ends[i]:
+                    steps[row] = 0
+                    continue
+                best = starts[i] + int(np.argmax(candidate_fitness[starts[i]:ends[i]]))
+                if candidate_fitness[best] > fitness[row]:
+                    data[row] = candidates.data[best]
+                    fitness[row], fitness_ex[row] = candidate_fitness[best], candidate_fitness_ex[best]
+                else:
+                    steps[row] //= 2
+        copies = first[inverse]
+        return PopulationArray.from_arrays(data[copies], mask), fitness[copies], fitness_ex[copies]
+
+    def refine(self, genetic, individuals: List[Individual], pool: 'FitnessPool' = None) -> List[Individual]:
+        # Object mode, the individuals have to be evaluated. Refined elites are returned as new individuals,
+        # the others as they are
+        arrays = genetic.to_array(individuals)
+        refined, fitness, fitness_ex = self.refine_array(genetic, arrays, [ind.fitness for ind in individuals],
+                                                         [ind.fitness_ex for ind in individuals], pool)
+        result = []
+        for i, individual in enumerate(individuals):
+            if fitness[i] > individual.fitness:
+                individual = genetic.individual_from_genome(refined.to_records(i))
+                individual.fitness, individual.fitness_ex = float(fitness[i]), tuple(fitness_ex[i].tolist())
+                individual.dirty = False
+            result.append(individual)
+        return result
@@ -0,0 +1,88 @@
+import math
+try:
+    from .Game import Game, Card, etherfields_game
+    from .Genetic import Genetic, Individual, individual_to_trays, display_individual, np
+    from .Termination import Termination, MaxGenerations, Stagnation, TargetFitness, default_termination
+except:
+    from Game import Game, Card, etherfields_game
+    from Genetic import Genetic, Individual, individual_to_trays, display_individual, np
+    from Termination import Termination, MaxGenerations, Stagnation, TargetFitness, default_termination
+
+# Coarse to fine search: the game is first solved on a grid of large cells, where a mutation step of a few
+# cells moves a tray by centimetres, then again on finer grids down to millimetres. The best individuals of
+# each level are scaled to the next grid and seed its population, so the fine levels only refine the layout
+
+def coarse_game(game: Game, cell: int) -> Game:
+    # The box is rounded down and the items up to whole cells, so a layout that fits on the coarse grid
+    # still fits when scaled back. Every item class becomes a single item of its stacked size
+    coarse = Game(max(1, game.length // cell), max(1, game.width // cell), max(1, game.height // cell))
+    for item_class in game.generate_classes():
+        dim_x, dim_y, dim_z = item_class.bounding_box()
+        coarse.add_items(Card(math.ceil(dim_z / cell), math.ceil(dim_x / cell), math.ceil(dim_y / cell)), 1)
+    return coarse
+
+def coarse_termination() -> Termination:
+    return Termination(MaxGenerations(300), Stagnation(30), TargetFitness(0.0))
+
+class MultiResolution:
+    def __init__(self, game: Game, population_size: int, number_of_elements_factor: float, unused_space_factor: float,
+                 unfit_factor: float, overlap_factor: float, overfit_factor: float, cells: tuple = (10, 3, 1),
+                 seed_fraction: float = 0.5, seed: int = None, **kwargs) -> None:
+        # cells are the grid sizes of the levels in millimetres from coarse to fine, the last level runs on
+        # the game itself. The top seed_fraction of each level's population seeds the next level, further
+        # keyword arguments, e.g. vectorized or layers, are passed to the Genetic of every level
+        self._game = game
+        self._population_size = population_size
+        self._factors = (number_of_elements_factor, unused_space_factor, unfit_factor, overlap_factor, overfit_factor)
+        self._cells = [cell for cell in cells if cell > 1] + [1]
+        self._seed_fraction = seed_fraction
+        self._seed = seed
+        self._kwargs = kwargs
+        self.level = -1
+        self.genetic: Genetic = None
+        self.termination_reason = None
+        self._evaluations = 0
+
+    @property
+    def evaluations(self) -> int:
+        # over all levels so far
+        return self._evaluations + (self.genetic.evaluations if self.genetic is not None else 0)
+
+    def next_level(self) -> Genetic:
+        # Creates the Genetic of the next level, seeded with the best layouts of the current one
+        previous = self.genetic
+        self.level += 1
+        cell = self._cells[self.level]
+        game = coarse_game(self._game, cell) if cell > 1 else self._game
+        seed = self._seed + self.level if self._seed is not None else None
+        genetic = Genetic(game, self._population_size, *self._factors, seed=seed, **self._kwargs)
+        if previous is not None:
+            count = max(1, round(self._seed_fraction * self._population_size))
+            layouts = [individual_to_trays(previous.individual_from_genome(genome)) for genome in previous.top_genomes(count)]
+            genetic.warm_start(layouts, self._seed_fraction, previous._game.bounding_box())
+            self._evaluations += previous.evaluations
+        self.genetic = genetic
+        return genetic
+
+    def run(self, termination: Termination = None, level_termination: Termination = None,
+            report_interval: int = 10) -> Individual:
+        # The coarse levels run until level_termination stops them, by default after 300 generations or 30
+        # without improvement, the finest level until termination does, see Genetic.run
+        level_termination = level_termination if level_termination is not None else coarse_termination()
+        termination = termination if termination is not None else default_termination()
+        winner = self.genetic.best() if self.genetic is not None else None
+        while self.level < len(self._cells) - 1:
+            genetic = self.next_level()
+            last = self.level == len(self._cells) - 1
+            if report_interval > 0:
+                print(f"Level {self.level} with {self._cells[self.level]} mm cells")
+            winner = genetic.run(termination if last else level_termination, report_interval=report_interval)
+        self.termination_reason = self.genetic.termination_reason
+        return winner
+
+def create_etherfields_multiresolution(cells: tuple = (10, 3, 1)):
+    winner = MultiResolution(etherfields_game(), 200, 0, 0.1, 1, 1, 1, cells=cells, vectorized=np is not None).run()
+
+    display_individual(winner)
+
+    return individual_to_trays(winner)
@@ -0,0 +1,87 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Overlap engine shared by the fitness and repair steps of the solver. Elements are given as
+# coordinate arrays: position (..., n, 3) with x, y, z and size (..., n, 3) with dim_x, dim_y, dim_z,
+# any leading dimensions (individuals of a population) are evaluated in the same pass.
+# Without numpy, or for short lists of elements where the array setup costs more than the loops,
+# the same results are computed with plain lists for a single set of elements.
+
+VECTORIZE_MIN_ELEMENTS = 8
+
+def _use_lists(position) -> bool:
+    return np is None or (not isinstance(position, np.ndarray) and len(position) < VECTORIZE_MIN_ELEMENTS)
+
+def overlap_extents(position, size):
+    # Overlap of every pair of elements in x, y and z, shape (..., n, n, 3)
+    if _use_lists(position):
+        return [[tuple(max(0, min(p1[a] + s1[a], p2[a] + s2[a]) - max(p1[a], p2[a])) for a in range(3))
+                 for p2, s2 in zip(position, size)] for p1, s1 in zip(position, size)]
+
+    position, size = np.asarray(position), np.asarray(size)
+    end = position + size
+    lower = np.maximum(position[..., :, None, :], position[..., None, :, :])
+    upper = np.minimum(end[..., :, None, :], end[..., None, :, :])
+    return np.maximum(0, upper - lower)
+
+def overlap_matrix(position, size, layer, valid=None, layers_count: int = 1):
+    # Overlap volume of every pair (i, j), i < j, of valid elements on the same layer, shape (..., n, n),
+    # together with the total overlap volume on each layer, shape (..., layers_count)
+    if _use_lists(position):
+        count = len(position)
+        valid = valid if valid is not None else [True] * count
+        volume = [[0] * count for _ in range(count)]
+        layer_sums = [0] * layers_count
+        for i in range(count):
+            for j in range(i + 1, count):
+                if not (valid[i] and valid[j]) or layer[i] != layer[j]:
+                    continue
+                overlap = 1
+                for a in range(3):
+                    overlap *= max(0, min(position[i][a] + size[i][a], position[j][a] + size[j][a]) - max(position[i][a], position[j][a]))
+                volume[i][j] = overlap
+                layer_sums[layer[i]] += overlap
+        return volume, layer_sums
+
+    layer = np.asarray(layer)
+    count = layer.shape[-1]
+    volume = overlap_extents(position, size).prod(axis=-1)
+    pairs = np.triu(np.ones((count, count), dtype=bool), k=1) & (layer[..., :, None] == layer[..., None, :])
+    if valid is not None:
+        valid = np.asarray(valid)
+        pairs = pairs & valid[..., :, None] & valid[..., None, :]
+    volume = np.where(pairs, volume, 0)
+
+    element_sums = volume.sum(axis=-1)
+    layer_sums = np.stack([(element_sums * (layer == l)).sum(axis=-1) for l in range(layers_count)], axis=-1)
+    return volume, layer_sums
+
+def candidate_pairs(position, size, layer) -> list:
+    # Sweep and prune over x for a single set of elements: the sorted (i, j), i < j, pairs of elements on the
+    # same layer whose boxes intersect. Each element is only compared with the elements whose x interval is
+    # still open, so sparse layouts cost far less than all pairs
+    x0, y0, z0 = [p[0] for p in position], [p[1] for p in position], [p[2] for p in position]
+    x1 = [p[0] + s[0] for p, s in zip(position, size)]
+    y1 = [p[1] + s[1] for p, s in zip(position, size)]
+    z1 = [p[2] + s[2] for p, s in zip(position, size)]
+    active = []
+    pairs = []
+    for i in sorted(range(len(position)), key=x0.__getitem__):
+        start = x0[i]
+        active = [j for j in active if x1[j] > start]
+        if x1[i] > start:
+            for j in active:
+                if (layer[i] == layer[j] and max(y0[i], y0[j]) < min(y1[i], y1[j])
+                        and max(z0[i], z0[j]) < min(z1[i], z1[j])):
+                    pairs.append((j, i) if j < i else (i, j))
+            active.append(i)
+    pairs.sort()
+    return pairs
+
+def pair_volume(position, size, i: int, j: int) -> int:
+    overlap = 1
+    for a in range(3):
+        overlap *= max(0, min(position[i][a] + size[i][a], position[j][a] + size[j][a]) - max(position[i][a], position[j][a]))
+    return overlap
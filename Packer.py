@@ -0,0 +1,62 @@
+from typing import List
+try:
+    from .Game import Game
+    from .Genetic import Individual, Tray, individual_to_trays
+except:
+    from Game import Game
+    from Genetic import Individual, Tray, individual_to_trays
+
+# Deterministic constructive layout with one tray per item class. Trays need the width of the item in x and
+# the stacked thickness of all items in y, they are packed first fit decreasing into columns along x that are
+# filled in y, a guillotine cut of the layer. Afterwards every tray is widened to its column and the last tray
+# of each column and the last column are stretched to the layer, so a layout that fits leaves no unused space.
+# Layouts that do not fit are left to the genetic search, items larger than the layer are cut to it.
+# With several layers a column that does not fit the layer any more is opened on the next layer.
+
+class _Column:
+    def __init__(self, x: int, width: int, layer: int = 0) -> None:
+        self.x = x
+        self.width = width
+        self.layer = layer
+        self.used_y = 0
+        self.entries = []
+
+def pack_columns(game: Game, layers: int = 1) -> List[_Column]:
+    layer_size_x, layer_size_y, _ = game.layer_size(layers)
+    required = [(min(x, layer_size_x), min(y, layer_size_y), z) for x, y, z in
+                (item_class.bounding_box() for item_class in game.generate_classes())]
+    order = sorted(range(len(required)), key=lambda i: (-required[i][0], -required[i][1], i))
+
+    columns: List[_Column] = []
+    layer = 0
+    for i in order:
+        required_x, required_y, _ = required[i]
+        column = next((c for c in columns if required_x <= c.width and c.used_y + required_y <= layer_size_y), None)
+        if column is None:
+            x = sum(c.width for c in columns if c.layer == layer)
+            if x + required_x > layer_size_x and layer < layers - 1:
+                layer += 1
+                x = 0
+            # layouts that do not fit open columns beyond the last layer, repair cuts them back
+            column = _Column(x, required_x, layer)
+            columns.append(column)
+        column.entries.append((i, column.used_y, required_y))
+        column.used_y += required_y
+    return columns
+
+def pack(game: Game, max_number_of_elements: int = 1, layers: int = 1) -> Individual:
+    layer_size_x, layer_size_y, layer_size_z = game.layer_size(layers)
+    columns = pack_columns(game, layers)
+    individual = Individual(len(game.generate_classes()), max_number_of_elements)
+    for c, column in enumerate(columns):
+        last_column = c == len(columns) - 1 or columns[c + 1].layer != column.layer
+        width = max(column.width, layer_size_x - column.x) if last_column else column.width
+        for e, (i, y, required_y) in enumerate(column.entries):
+            length = max(required_y, layer_size_y - y) if e == len(column.entries) - 1 else required_y
+            individual.data[i].data = [Tray(width, length, layer_size_z, column.x, y,
+                                            column.layer * layer_size_z, column.layer)]
+    return individual
+
+def create_packed_layout(game: Game, layers: int = 1) -> List[dict]:
+    # fast mode without the genetic search, same result format as the solver
+    return individual_to_trays(pack(game, layers=layers))
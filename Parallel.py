@@ -0,0 +1,348 @@
+from typing import List
+try:
+    from .Game import etherfields_game
+    from .Genetic import Genetic, Individual, individual_to_trays, display_individual
+    from .PopulationArray import PopulationArray, PARAMS_COUNT, np
+    from .Termination import Termination, EvaluationBudget, TargetFitness
+except:
+    from Game import etherfields_game
+    from Genetic import Genetic, Individual, individual_to_trays, display_individual
+    from PopulationArray import PopulationArray, PARAMS_COUNT, np
+    from Termination import Termination, EvaluationBudget, TargetFitness
+
+import math
+import weakref
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from multiprocessing import shared_memory, resource_tracker
+
+# Each worker process holds its own Genetic built once from the immutable game context,
+# tasks only carry the genomes to score and return the fitness values
+_worker_genetic: Genetic = None
+_worker_shared = {}
+# blocks closed while arrays handed out by SharedPopulation.store still refer to them, they are unmapped later
+_retired_blocks = []
+
+def _init_worker(context: dict) -> None:
+    global _worker_genetic
+    _worker_genetic = Genetic.from_context(context)
+
+def _evaluate_shared(spec: tuple, start: int, stop: int) -> None:
+    # reads the genomes from and writes the fitness to the shared population, nothing but the row range is sent
+    name = spec[0]
+    if name not in _worker_shared:
+        # the population and the scratch block of the pool stay attached, blocks of earlier sizes are closed
+        while len(_worker_shared) >= 2:
+            _worker_shared.pop(next(iter(_worker_shared))).close()
+        _worker_shared[name] = SharedPopulation.attach(spec)
+    shared = _worker_shared[name]
+    fitness, fitness_ex = _worker_genetic.compute_fitness_array(
+        PopulationArray.from_arrays(shared.data[start:stop], shared.mask[start:stop]))
+    shared.fitness[start:stop] = fitness
+    shared.fitness_ex[start:stop] = fitness_ex
+
+def _breed(parent1: tuple, parent2: tuple) -> tuple:
+    # crossover, mutation, repair and evaluation of a single child in the worker
+    child = _worker_genetic.crossover(_worker_genetic.individual_from_genome(parent1),
+                                      _worker_genetic.individual_from_genome(parent2))
+    _worker_genetic.mutate(child)
+    _worker_genetic.repair_individual(child)
+    _worker_genetic.compute_fitness(child)
+    return child.genome(), child.fitness, child.fitness_ex
+
+def _evaluate_arrays(data, mask):
+    fitness, fitness_ex = _worker_genetic.compute_fitness_array(PopulationArray.from_arrays(data, mask))
+    return fitness, fitness_ex
+
+def _evaluate_genomes(genomes: List[tuple]) -> List[tuple]:
+    results = []
+    for genome in genomes:
+        individual = _worker_genetic.individual_from_genome(genome)
+        _worker_genetic.compute_fitness(individual)
+        results.append((individual.fitness, individual.fitness_ex))
+    return results
+
+class SharedPopulation:
+    # Population arrays of fixed capacity in one shared memory block, tray records are stored as int64 records
+    # of the PopulationArray layout followed by the fitness values, the mask is kept at the end of the block
+    def __init__(self, capacity: int, gene_count: int, max_number_of_elements: int, name: str = None) -> None:
+        self.shape = (capacity, gene_count, max_number_of_elements)
+        data_size = capacity * gene_count * max_number_of_elements * PARAMS_COUNT * 8
+        fitness_size = capacity * 8
+        fitness_ex_size = capacity * 4 * 8
+        mask_size = capacity * gene_count * max_number_of_elements
+        size = data_size + fitness_size + fitness_ex_size + mask_size
+        # arrays returned by store, the block is not unmapped while any of them is alive
+        self._views = []
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=max(1, size))
+            self._owner = True
+        else:
+            # the creating process owns the block and unlinks it, workers attached by name only close it
+            self._shm = shared_memory.SharedMemory(name=name)
+            self._owner = False
+
+        buffer = self._shm.buf
+        offset = 0
+        self.data = np.ndarray(self.shape + (PARAMS_COUNT,), dtype=np.int64, buffer=buffer, offset=offset)
+        offset += data_size
+        self.fitness = np.ndarray((capacity,), dtype=np.float64, buffer=buffer, offset=offset)
+        offset += fitness_size
+        self.fitness_ex = np.ndarray((capacity, 4), dtype=np.float64, buffer=buffer, offset=offset)
+        offset += fitness_ex_size
+        self.mask = np.ndarray(self.shape, dtype=bool, buffer=buffer, offset=offset)
+
+    @property
+    def capacity(self) -> int:
+        return self.shape[0]
+
+    def spec(self) -> tuple:
+        return (self._shm.name,) + self.shape
+
+    @staticmethod
+    def attach(spec: tuple):
+        name, capacity, gene_count, max_number_of_elements = spec
+        return SharedPopulation(capacity, gene_count, max_number_of_elements, name)
+
+    def fits(self, arrays: PopulationArray) -> bool:
+        return arrays.population_size <= self.capacity and arrays.data.shape[1:3] == self.shape[1:]
+
+    def is_backing(self, arrays: PopulationArray) -> bool:
+        return np.shares_memory(arrays.data, self.data)
+
+    def in_use(self) -> bool:
+        self._views = [view for view in self._views if view() is not None]
+        return len(self._views) > 0
+
+    def store(self, arrays: PopulationArray) -> PopulationArray:
+        # copy the population into the block and return it as a PopulationArray backed by the block
+        count = arrays.population_size
+        if not self.is_backing(arrays):
+            self.data[:count] = arrays.data
+            self.mask[:count] = arrays.mask
+        stored = PopulationArray.from_arrays(self.data[:count], self.mask[:count])
+        self.in_use()
+        self._views.extend([weakref.ref(stored.data), weakref.ref(stored.mask)])
+        return stored
+
+    def close(self) -> None:
+        # The name is released right away. Arrays on the block do not keep its mapping alive, so while arrays
+        # returned by store are still in use the block is retired and unmapped once they are gone
+        if self._owner:
+            self._shm.unlink()
+            self._owner = False
+        if self.in_use():
+            _retired_blocks.append(self)
+            return
+        # views have to be released before the block can be closed
+        self.data = self.mask = self.fitness = self.fitness_ex = None
+        self._shm.close()
+
+def _release_retired_blocks() -> None:
+    for block in [block for block in _retired_blocks if not block.in_use()]:
+        _retired_blocks.remove(block)
+        block.close()
+
+class FitnessPool:
+    def __init__(self, genetic: Genetic, workers: int = None, chunks_per_worker: int = 4, shared: bool = False) -> None:
+        # With shared set the population is exchanged through a SharedPopulation block, the tasks then
+        # only carry row ranges and the workers write the fitness values into the block
+        self._genetic = genetic
+        self.workers = workers if workers is not None else mp.cpu_count()
+        self._chunks_per_worker = chunks_per_worker
+        self._shared_enabled = shared
+        self.shared: SharedPopulation = None
+        # other batches than the population are scored in a block of their own, the population is not touched
+        self.scratch: SharedPopulation = None
+        if shared:
+            if np is None:
+                raise ImportError("numpy is required for the shared memory population")
+            # workers have to share the resource tracker of this process, otherwise a worker's own tracker
+            # would unlink the blocks it attached to when the worker exits
+            resource_tracker.ensure_running()
+        self._pool = mp.Pool(self.workers, initializer=_init_worker, initargs=(genetic.context(),))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        if self.shared is not None:
+            # the solver keeps its population, copied out of the block before it is released
+            arrays = self._genetic._arrays
+            if arrays is not None and self.shared.is_backing(arrays):
+                self._genetic._arrays = PopulationArray.from_arrays(arrays.data.copy(), arrays.mask.copy())
+            self.shared.close()
+            self.shared = None
+        if self.scratch is not None:
+            self.scratch.close()
+            self.scratch = None
+        _release_retired_blocks()
+
+    def share(self, arrays: PopulationArray) -> PopulationArray:
+        # Keep the population in the shared block, reallocating it when the population outgrows it
+        if not self._shared_enabled:
+            return arrays
+        _release_retired_blocks()
+        population = self._genetic._arrays
+        if (self.shared is not None and population is not None and population is not arrays
+                and self.shared.is_backing(population) and not self.shared.is_backing(arrays)):
+            # the solver's population would be overwritten, it keeps a copy until it is replaced
+            self._genetic._arrays = PopulationArray.from_arrays(population.data.copy(), population.mask.copy())
+        if self.shared is None or not self.shared.fits(arrays):
+            # the population may still live in the old block, it is copied over before the block is released
+            previous = self.shared
+            self.shared = SharedPopulation(arrays.population_size, arrays.gene_count, arrays.max_number_of_elements)
+            arrays = self.shared.store(arrays)
+            if previous is not None:
+                previous.close()
+            return arrays
+        return self.shared.store(arrays)
+
+    def _chunks(self, count: int) -> List[slice]:
+        size = max(1, math.ceil(count / (self.workers * self._chunks_per_worker)))
+        return [slice(start, min(count, start + size)) for start in range(0, count, size)]
+
+    def evaluate(self, individuals: List[Individual]) -> None:
+        # Score the dirty individuals in the workers and attach the fitness to them, genomes found in
+        # the fitness cache or repeated within the batch are only scored once
+        pending = self._genetic.pending_evaluations(individuals)
+        if len(pending) == 0:
+            return
+
+        genomes = list(pending.keys())
+        if np is not None:
+            fitness, fitness_ex = self.evaluate_array(self._genetic.to_array([pending[genome][0] for genome in genomes]))
+            entries = [(f, tuple(ex)) for f, ex in zip(fitness.tolist(), fitness_ex.tolist())]
+        else:
+            results = self._pool.map(_evaluate_genomes, [genomes[chunk] for chunk in self._chunks(len(genomes))])
+            entries = [entry for chunk in results for entry in chunk]
+            self._genetic.evaluations += len(genomes)
+
+        for genome, entry in zip(genomes, entries):
+            self._genetic.store_evaluation(genome, pending[genome], entry)
+
+    def evaluate_array(self, arrays: PopulationArray, rows=None):
+        # Fitness of the given rows (all by default) of the population
+        if self._shared_enabled:
+            if self.shared is not None and self.shared.is_backing(arrays):
+                block = self.shared
+            else:
+                # any other batch is copied to the scratch block, the arrays returned by store are not kept
+                if rows is not None:
+                    arrays, rows = arrays.take(rows), None
+                if self.scratch is None or not self.scratch.fits(arrays):
+                    if self.scratch is not None:
+                        self.scratch.close()
+                    self.scratch = SharedPopulation(arrays.population_size, arrays.gene_count, arrays.max_number_of_elements)
+                self.scratch.store(arrays)
+                block = self.scratch
+            if rows is None:
+                rows = np.arange(arrays.population_size)
+            return self._evaluate_shared(block, rows)
+        if rows is not None:
+            arrays = arrays.take(rows)
+        chunks = self._chunks(arrays.population_size)
+        results = self._pool.starmap(_evaluate_arrays, [(arrays.data[chunk], arrays.mask[chunk]) for chunk in chunks])
+        self._genetic.evaluations += arrays.population_size
+        fitness = np.concatenate([fitness for fitness, _ in results])
+        fitness_ex = np.concatenate([fitness_ex for _, fitness_ex in results])
+        return fitness, fitness_ex
+
+    def _evaluate_shared(self, block: SharedPopulation, rows):
+        # contiguous runs of rows are split into chunks, the tasks carry the row ranges only
+        tasks = []
+        spec = block.spec()
+        breaks = np.flatnonzero(np.diff(rows) != 1) + 1
+        for run in np.split(rows, breaks):
+            if len(run) == 0:
+                continue
+            for chunk in self._chunks(len(run)):
+                tasks.append((spec, int(run[chunk.start]), int(run[chunk.stop - 1]) + 1))
+        self._pool.starmap(_evaluate_shared, tasks)
+        self._genetic.evaluations += len(rows)
+        return block.fitness[rows].copy(), block.fitness_ex[rows].copy()
+
+class SteadyStateScheduler:
+    def __init__(self, genetic: Genetic, workers: int = None, tasks_in_flight: int = None) -> None:
+        # Keeps tasks_in_flight children being bred on the workers, each finished child replaces the loser of
+        # a tournament if it is at least as fit, so no worker waits for a generation to complete
+        self._genetic = genetic
+        self.workers = workers if workers is not None else mp.cpu_count()
+        self._tasks_in_flight = tasks_in_flight if tasks_in_flight is not None else 2 * self.workers
+        self._executor = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(genetic.context(),))
+        self._futures = set()
+        self.evaluations = 0
+        self.winner: Individual = genetic.best()
+        self.termination_reason = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    @property
+    def generation(self) -> int:
+        # a population size worth of children counts as one generation
+        return self.evaluations // max(1, len(self._genetic.population))
+
+    def diversity(self) -> float:
+        return self._genetic.diversity()
+
+    def close(self) -> None:
+        for future in self._futures:
+            future.cancel()
+        self._futures.clear()
+        self._executor.shutdown(wait=True)
+
+    def _submit(self) -> None:
+        parent1, parent2 = self._genetic.select(), self._genetic.select()
+        self._futures.add(self._executor.submit(_breed, parent1.genome(), parent2.genome()))
+
+    def insert(self, genome: tuple, fitness: float, fitness_ex: tuple) -> bool:
+        child = self._genetic.individual_from_genome(genome)
+        child.fitness, child.fitness_ex = fitness, fitness_ex
+        child.dirty = False
+        self._genetic.fitness_cache.put(genome, (fitness, fitness_ex))
+        loser = self._genetic.select_loser()
+        if fitness < self._genetic.compute_fitness(self._genetic.population[loser]):
+            return False
+        self._genetic.replace_at(loser, child)
+        if fitness > self.winner.fitness:
+            self.winner = child
+        return True
+
+    def run(self, evaluations: int, report_interval: int = 1000, termination: Termination = None) -> Individual:
+        # the termination is checked after every inserted child, the run always stops after evaluations children
+        termination = Termination(EvaluationBudget(evaluations), termination if termination is not None else TargetFitness(0.0))
+        termination.reset(self)
+        while termination.reason is None:
+            while len(self._futures) < self._tasks_in_flight:
+                self._submit()
+            done, self._futures = wait(self._futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                self.insert(*future.result())
+                self.evaluations += 1
+                self._genetic.evaluations += 1
+                if report_interval > 0 and self.evaluations % report_interval == 0:
+                    print(f"Evaluation {self.evaluations} fitness: {self.winner.fitness}")
+                if termination.should_stop(self, self.winner):
+                    break
+        self.termination_reason = termination.reason
+        return self.winner
+
+def create_etherfields_steady_state(workers: int = None, evaluations: int = 600000):
+    genetic = Genetic(etherfields_game(), 200, 0, 0.1, 1, 1, 1)
+    with SteadyStateScheduler(genetic, workers) as scheduler:
+        winner = scheduler.run(evaluations)
+
+    display_individual(winner)
+
+    return individual_to_trays(winner)
@@ -0,0 +1,163 @@
+from typing import List
+try:
+    from .Game import Game, cards_game
+    from .Genetic import Genetic, Individual, individual_to_trays, np
+    from .PopulationArray import PopulationArray
+    from .Termination import Termination, default_termination
+except:
+    from Game import Game, cards_game
+    from Genetic import Genetic, Individual, individual_to_trays, np
+    from PopulationArray import PopulationArray
+    from Termination import Termination, default_termination
+
+# Multi-objective search in the style of NSGA-II: the penalties of fitness_ex are kept as separate objectives
+# instead of being weighted into one fitness, so a single run returns the layouts of all trade-offs between
+# them, the Pareto front, and any weighting can be chosen from it afterwards
+OBJECTIVES = ('unused_space', 'unfit', 'overlap', 'overfit')
+
+def non_dominated_sort(objectives) -> List:
+    # Fast non-dominated sorting of the rows of objectives, all minimized. Returns the fronts as arrays of
+    # row indices, the first front holds the rows no other row dominates
+    objectives = np.asarray(objectives, dtype=np.float64)
+    # dominates[i, j] when row i is nowhere worse than row j and better in some objective
+    dominates = ((objectives[:, None] <= objectives[None]).all(axis=2)
+                 & (objectives[:, None] < objectives[None]).any(axis=2))
+    counts = dominates.sum(axis=0)
+    assigned = np.zeros(len(objectives), dtype=bool)
+    fronts = []
+    current = np.flatnonzero(counts == 0)
+    while len(current) > 0:
+        fronts.append(current)
+        assigned[current] = True
+        counts = counts - dominates[current].sum(axis=0)
+        current = np.flatnonzero((counts == 0) & ~assigned)
+    return fronts
+
+def crowding_distance(objectives) -> 'np.ndarray':
+    # Crowding distance of the rows of one front, the rows at the ends of every objective get an infinite one
+    objectives = np.asarray(objectives, dtype=np.float64)
+    distance = np.zeros(len(objectives))
+    for m in range(objectives.shape[1]):
+        order = np.argsort(objectives[:, m], kind='stable')
+        values = objectives[order, m]
+        distance[order[[0, -1]]] = np.inf
+        span = values[-1] - values[0]
+        if span > 0 and len(order) > 2:
+            distance[order[1:-1]] += (values[2:] - values[:-2]) / span
+    return distance
+
+def rank_and_crowding(objectives) -> tuple:
+    ranks = np.zeros(len(objectives), dtype=np.int64)
+    crowding = np.zeros(len(objectives))
+    for rank, front in enumerate(non_dominated_sort(objectives)):
+        ranks[front] = rank
+        crowding[front] = crowding_distance(objectives[front])
+    return ranks, crowding
+
+class NSGA2:
+    def __init__(self, game: Game, population_size: int, objectives: tuple = OBJECTIVES, factors: tuple = (0, 0.1, 1, 1, 1),
+                 seed: int = None, **kwargs) -> None:
+        # objectives are the names of the penalties of fitness_ex to trade off. The population and its operators
+        # are those of a vectorized Genetic, which is created with the penalty factors and further keyword
+        # arguments, e.g. layers. Its weighted fitness only serves the reports and the termination,
+        # selection and survival go by the objectives. The local search and adaptation of Genetic are not used
+        if np is None:
+            raise ImportError("numpy is required for the Pareto search")
+        self.objectives = [OBJECTIVES.index(name) for name in objectives]
+        self.genetic = Genetic(game, population_size, *factors, vectorized=True, seed=seed, **kwargs)
+
+    def objective_values(self, fitness_ex):
+        return np.abs(np.asarray(fitness_ex, dtype=np.float64)[:, self.objectives])
+
+    def select(self, count: int, ranks, crowding):
+        # binary tournaments by rank, ties are won by the less crowded individual
+        a, b = self.genetic._rng.integers(0, len(ranks), size=(2, count))
+        better = (ranks[a] < ranks[b]) | ((ranks[a] == ranks[b]) & (crowding[a] > crowding[b]))
+        return np.where(better, a, b)
+
+    def run_generation(self, pool: 'FitnessPool' = None) -> PopulationArray:
+        # The children of the whole population compete with their parents, the population is refilled
+        # front by front and the last front that fits in part keeps its least crowded individuals
+        genetic = self.genetic
+        genetic.generation += 1
+        population_size = genetic._population_size
+        fitness = genetic.compute_fitness_array(pool=pool)
+        fitness_ex = genetic._fitness_ex
+        ranks, crowding = rank_and_crowding(self.objective_values(fitness_ex))
+
+        num_pairs = (population_size + 1) // 2
+        parents = self.select(2 * num_pairs, ranks, crowding)
+        parents1 = genetic._arrays.take(np.repeat(parents[0::2], 2)[:population_size])
+        parents2 = genetic._arrays.take(np.repeat(parents[1::2], 2)[:population_size])
+        children = genetic.blended_crossover_array(parents1, parents2)
+        genetic.mutate_array(children)
+        genetic.repair_array(children)
+        if pool is not None:
+            children_fitness, children_fitness_ex = pool.evaluate_array(children)
+        else:
+            children_fitness, children_fitness_ex = genetic.compute_fitness_array(children)
+
+        combined = PopulationArray.concatenate([genetic._arrays, children])
+        combined_fitness = np.concatenate([fitness, children_fitness])
+        combined_fitness_ex = np.concatenate([fitness_ex, children_fitness_ex])
+        objectives = self.objective_values(combined_fitness_ex)
+        survivors = []
+        for front in non_dominated_sort(objectives):
+            if len(survivors) + len(front) > population_size:
+                crowding = crowding_distance(objectives[front])
+                survivors.extend(front[np.argsort(-crowding, kind='stable')[:population_size - len(survivors)]])
+                break
+            survivors.extend(front)
+        survivors = np.array(survivors)
+
+        genetic._arrays = combined.take(survivors)
+        if pool is not None:
+            genetic._arrays = pool.share(genetic._arrays)
+        genetic._fitness = combined_fitness[survivors]
+        genetic._fitness_ex = combined_fitness_ex[survivors]
+        return genetic._arrays
+
+    def front(self) -> List[Individual]:
+        # The non-dominated individuals of the population, one per distinct objective vector, ordered by the
+        # first objective
+        genetic = self.genetic
+        genetic.compute_fitness_array()
+        objectives = self.objective_values(genetic._fitness_ex)
+        first = non_dominated_sort(objectives)[0]
+        _, unique = np.unique(objectives[first], axis=0, return_index=True)
+        first = first[np.sort(unique)]
+        first = first[np.lexsort(objectives[first].T[::-1])]
+        return [genetic.individual_from_array(genetic._arrays, int(i)) for i in first]
+
+    def run(self, termination: Termination = None, pool: 'FitnessPool' = None, report_interval: int = 10) -> List[Individual]:
+        # Evolves until the termination stops the run, see Genetic.run, and returns the Pareto front.
+        # The termination sees the individual of the best weighted fitness
+        termination = termination if termination is not None else default_termination()
+        genetic = self.genetic
+        termination.reset(genetic)
+        while True:
+            self.run_generation(pool)
+            winner = genetic.best()
+            if report_interval > 0 and genetic.generation % report_interval == 0:
+                print(f"Generation {genetic.generation} fitness: {winner.fitness} front: {len(self.front())}")
+            if termination.should_stop(genetic, winner):
+                break
+        genetic.termination_reason = termination.reason
+        return self.front()
+
+def trade_off(front: List[Individual], unused_space_factor: float, unfit_factor: float, overlap_factor: float,
+              overfit_factor: float) -> Individual:
+    # The individual of the front with the best weighted sum of its penalties, as a Genetic with these factors
+    # would rank it without the number of elements term
+    factors = (unused_space_factor, unfit_factor, overlap_factor, overfit_factor)
+    return min(front, key=lambda ind: sum(factor * abs(value) for factor, value in zip(factors, ind.fitness_ex)))
+
+def create_cards_pareto():
+    # The cards do not fit the depth of the box, the front shows the trade-off between the unused space and
+    # the cards that stick out of their trays or the trays out of the box
+    front = NSGA2(cards_game(), 200).run()
+    for individual in front:
+        unused_space, unfit, overlap, overfit = individual.fitness_ex
+        print(f"unused space {unused_space}, unfit {unfit}, overlap {overlap}, overfit {overfit}")
+
+    return [individual_to_trays(individual) for individual in front]
@@ -0,0 +1,79 @@
+import math
+from itertools import chain
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Layout of a single tray record, same order as the Tray constructor arguments.
+# The orientation indexes the orientations of the items of the tray's class, 0 is upright
+DIM_X, DIM_Y, DIM_Z, X, Y, Z, LAYER, ORIENTATION = range(8)
+PARAMS_COUNT = 8
+
+class PopulationArray:
+    def __init__(self, population_size: int, gene_count: int, max_number_of_elements: int) -> None:
+        # All trays of the population live in one (individual, gene, slot, param) array,
+        # the mask tells which slots of a gene hold an element. Elements of a gene are always
+        # packed to the front, so the number of elements of a gene is the number of set slots
+        self.data = np.zeros((population_size, gene_count, max_number_of_elements, PARAMS_COUNT), dtype=np.int64)
+        self.mask = np.zeros((population_size, gene_count, max_number_of_elements), dtype=bool)
+
+    @property
+    def population_size(self) -> int:
+        return self.data.shape[0]
+
+    @property
+    def gene_count(self) -> int:
+        return self.data.shape[1]
+
+    @property
+    def max_number_of_elements(self) -> int:
+        return self.data.shape[2]
+
+    def counts(self):
+        return self.mask.sum(axis=2)
+
+    def take(self, indices):
+        return PopulationArray.from_arrays(self.data[indices], self.mask[indices])
+
+    @staticmethod
+    def from_arrays(data, mask):
+        result = PopulationArray.__new__(PopulationArray)
+        result.data = data
+        result.mask = mask
+        return result
+
+    @staticmethod
+    def concatenate(arrays):
+        return PopulationArray.from_arrays(np.concatenate([a.data for a in arrays]), np.concatenate([a.mask for a in arrays]))
+
+    @staticmethod
+    def from_records(records, gene_count: int, max_number_of_elements: int):
+        # records is a list (per individual) of lists (per gene) of tray parameter tuples, e.g. genomes.
+        # The records are padded to the slots of a gene and read into the array in one go
+        if all(len(elements) == max_number_of_elements for genes in records for elements in genes):
+            # every slot is used, e.g. with a single element per gene
+            shape = (len(records), gene_count, max_number_of_elements, PARAMS_COUNT)
+            data = np.fromiter(chain.from_iterable(chain.from_iterable(chain.from_iterable(records))), dtype=np.int64, count=math.prod(shape)).reshape(shape)
+            return PopulationArray.from_arrays(data, np.ones(data.shape[:3], dtype=bool))
+        result = PopulationArray(len(records), gene_count, max_number_of_elements)
+        empty = (0,) * PARAMS_COUNT
+        flat = []
+        counts = []
+        for genes in records:
+            for elements in genes:
+                elements = elements[:max_number_of_elements]
+                counts.append(len(elements))
+                flat.extend(elements)
+                flat.extend([empty] * (max_number_of_elements - len(elements)))
+        if len(flat) > 0:
+            result.data[...] = np.fromiter(chain.from_iterable(flat), dtype=np.int64, count=len(flat) * PARAMS_COUNT).reshape(result.data.shape)
+            result.mask[...] = np.arange(max_number_of_elements) < np.array(counts).reshape(result.mask.shape[:2] + (1,))
+        return result
+
+    def to_records(self, index: int) -> tuple:
+        # same nested tuples as Individual.genome
+        genes = []
+        for j in range(self.gene_count):
+            genes.append(tuple(tuple(int(v) for v in self.data[index, j, k]) for k in np.flatnonzero(self.mask[index, j])))
+        return tuple(genes)
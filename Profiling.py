@@ -0,0 +1,143 @@
+import csv
+import json
+import time
+from typing import Callable, List
+
+# Methods timed for each phase of a generation, object mode first and vectorized mode second.
+# The profiler replaces them on the solver instance by timed versions, a solver without an attached
+# profiler runs its own methods untouched
+PHASES = {
+    'selection': ('select', 'select_array'),
+    'crossover': ('crossover', 'blended_crossover_array'),
+    'mutation': ('mutate', 'mutate_array'),
+    'repair': ('repair_individual', 'repair_array'),
+    'fitness': ('compute_fitness', 'compute_fitness_array'),
+}
+POOL_PHASES = {
+    'fitness': ('evaluate', 'evaluate_array'),
+}
+
+class Profiler:
+    def __init__(self, observers: List[Callable[[dict], None]] = None) -> None:
+        # Observers are called with the stats of every generation, a dict with the generation number,
+        # its wall time, the wall time and number of calls of each phase, the number of fitness
+        # evaluations and the fitness cache hits and misses. The drivers score the children after
+        # run_generation returns, e.g. in best(), so the work between two generations is counted in the
+        # next one and its time runs from the end of the previous generation
+        self.observers = list(observers) if observers is not None else []
+        self.generation = 0
+        self.last: dict = None
+        self._genetic = None
+        self._wrapped = []
+        self._times = dict.fromkeys(PHASES, 0.0)
+        self._calls = dict.fromkeys(PHASES, 0)
+        self._depth = dict.fromkeys(PHASES, 0)
+        # time, evaluations and cache hits and misses at the end of the previous generation
+        self._mark: tuple = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.detach()
+
+    def attach(self, genetic, pool=None):
+        # pool is an optional FitnessPool, its evaluations count as the fitness phase
+        self.detach()
+        self._genetic = genetic
+        self._reset()
+        for phase, names in PHASES.items():
+            for name in names:
+                self._wrap(genetic, name, phase)
+        if pool is not None:
+            for phase, names in POOL_PHASES.items():
+                for name in names:
+                    self._wrap(pool, name, phase)
+
+        run_generation = genetic.run_generation
+        def timed_run_generation(*args, **kwargs):
+            cache = genetic.fitness_cache
+            if self._mark is None:
+                self._mark = (time.perf_counter(), genetic.evaluations, cache.hits, cache.misses)
+            start, evaluations, hits, misses = self._mark
+            result = run_generation(*args, **kwargs)
+            end = time.perf_counter()
+
+            stats = {'generation': self.generation, 'time': end - start}
+            for phase in PHASES:
+                stats[f'{phase}_time'] = self._times[phase]
+                stats[f'{phase}_calls'] = self._calls[phase]
+            stats['evaluations'] = genetic.evaluations - evaluations
+            stats['cache_hits'] = cache.hits - hits
+            stats['cache_misses'] = cache.misses - misses
+            self._reset()
+            self._mark = (end, genetic.evaluations, cache.hits, cache.misses)
+            self.generation += 1
+            self.last = stats
+            for observer in self.observers:
+                observer(stats)
+            return result
+        genetic.run_generation = timed_run_generation
+        self._wrapped.append((genetic, 'run_generation'))
+        return genetic
+
+    def detach(self) -> None:
+        for owner, name in self._wrapped:
+            delattr(owner, name)
+        self._wrapped = []
+        self._genetic = None
+
+    def _reset(self) -> None:
+        for phase in PHASES:
+            self._times[phase] = 0.0
+            self._calls[phase] = 0
+        self._mark = None
+
+    def _wrap(self, owner, name: str, phase: str) -> None:
+        method = getattr(owner, name)
+        def timed(*args, **kwargs):
+            # calls nested in a call of the same phase, e.g. a batch evaluating its rows, are part of the outer call
+            if self._depth[phase] > 0:
+                return method(*args, **kwargs)
+            self._depth[phase] += 1
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self._times[phase] += time.perf_counter() - start
+                self._calls[phase] += 1
+                self._depth[phase] -= 1
+        setattr(owner, name, timed)
+        self._wrapped.append((owner, name))
+
+class JsonlWriter:
+    # Observer writing the stats of every generation as one JSON object per line
+    def __init__(self, path: str) -> None:
+        self._file = open(path, 'w')
+
+    def __call__(self, stats: dict) -> None:
+        self._file.write(json.dumps(stats) + '\n')
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+class CsvWriter:
+    # Observer writing the stats of every generation as a row, the columns are taken from the first generation
+    def __init__(self, path: str) -> None:
+        self._file = open(path, 'w', newline='')
+        self._writer = None
+
+    def __call__(self, stats: dict) -> None:
+        if self._writer is None:
+            self._writer = csv.DictWriter(self._file, fieldnames=list(stats.keys()), extrasaction='ignore')
+            self._writer.writeheader()
+        self._writer.writerow(stats)
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+def stats_writer(path: str):
+    # CSV for a .csv path, JSON lines otherwise
+    return CsvWriter(path) if path.lower().endswith('.csv') else JsonlWriter(path)
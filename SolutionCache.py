@@ -0,0 +1,74 @@
+import hashlib
+import json
+import os
+from typing import List
+try:
+    from .Game import Game
+except:
+    from Game import Game
+
+class SolutionCache:
+    # Layouts (individual_to_trays results) stored on disk as one JSON file per game and solver parameters.
+    # Reading an entry marks it as recently used, the least recently used entries are removed once the
+    # cache holds more than max_entries entries or max_bytes bytes
+    def __init__(self, directory: str, max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(game: Game, parameters: dict = None) -> str:
+        content = json.dumps([game.canonical(), parameters if parameters is not None else {}], sort_keys=True, default=repr)
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key: str) -> List[dict]:
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return entry['trays']
+
+    def put(self, key: str, trays: List[dict], fitness: float = None) -> None:
+        path = self._path(key)
+        temporary = path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump({'trays': trays, 'fitness': fitness}, f)
+        os.replace(temporary, path)
+        self.evict()
+
+    def evict(self) -> None:
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        entries.sort(reverse=True)
+
+        count = total = 0
+        for _, size, name in entries:
+            count += 1
+            total += size
+            if count > self.max_entries or total > self.max_bytes:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def clear(self) -> None:
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                os.remove(os.path.join(self.directory, name))
+
+    def __len__(self) -> int:
+        return sum(1 for name in os.listdir(self.directory) if name.endswith('.json'))
@@ -0,0 +1,285 @@
+import math
+import time
+from typing import List
+try:
+    from .Game import Game
+    from .Genetic import Genetic, Individual, individual_to_trays, NO_MUTATION, np
+    from .PopulationArray import PopulationArray, DIM_X, DIM_Y, DIM_Z, X, Y, Z, LAYER, ORIENTATION
+    from .Termination import Termination, EvaluationBudget, TargetFitness
+except:
+    from Game import Game
+    from Genetic import Genetic, Individual, individual_to_trays, NO_MUTATION, np
+    from PopulationArray import PopulationArray, DIM_X, DIM_Y, DIM_Z, X, Y, Z, LAYER, ORIENTATION
+    from Termination import Termination, EvaluationBudget, TargetFitness
+
+# Optimizers behind a common interface, solve(game, budget) returns the layout of the best individual found
+# within budget fitness evaluations in the format of individual_to_trays. All backends score layouts with the
+# penalties of Genetic and repair them with its repair, so their fitness values compare directly, e.g.
+#   layout = solve(game, 20000, 'cmaes', seed=1)
+
+class Solver:
+    name = None
+
+    def __init__(self, factors: tuple = (0, 0.1, 1, 1, 1), seed: int = None, target_fitness: float = 0.0,
+                 **options) -> None:
+        # factors are the penalty factors of Genetic, further options such as layers are passed to it.
+        # The search stops early once the best fitness reaches target_fitness
+        self.factors = factors
+        self.seed = seed
+        self.target_fitness = target_fitness
+        self.options = options
+        self.genetic: Genetic = None
+        self.best: Individual = None
+        self.elapsed = 0.0
+        self.time_to_target = None
+
+    @property
+    def evaluations(self) -> int:
+        return self.genetic.evaluations if self.genetic is not None else 0
+
+    def create_genetic(self, game: Game, population_size: int = 0, **kwargs) -> Genetic:
+        return Genetic(game, population_size, *self.factors, seed=self.seed, **self.options, **kwargs)
+
+    def solve(self, game: Game, budget: int) -> List[dict]:
+        self.best = None
+        self.time_to_target = None
+        self._start = time.perf_counter()
+        self.search(game, budget)
+        self.elapsed = time.perf_counter() - self._start
+        return individual_to_trays(self.best)
+
+    def search(self, game: Game, budget: int) -> None:
+        raise NotImplementedError
+
+    def done(self, budget: int) -> bool:
+        return self.evaluations >= budget or (self.best is not None and self.best.fitness >= self.target_fitness)
+
+    def offer(self, individual: Individual) -> None:
+        # keeps the individual when it is the best so far, it must not be changed afterwards
+        if self.best is None or individual.fitness > self.best.fitness:
+            self.best = individual
+            if self.time_to_target is None and individual.fitness >= self.target_fitness:
+                self.time_to_target = time.perf_counter() - self._start
+
+    def offer_array(self, arrays: PopulationArray, fitness, fitness_ex) -> None:
+        index = int(np.argmax(fitness))
+        if self.best is None or fitness[index] > self.best.fitness:
+            individual = self.genetic.individual_from_genome(arrays.to_records(index))
+            individual.fitness, individual.fitness_ex = float(fitness[index]), tuple(fitness_ex[index].tolist())
+            individual.dirty = False
+            self.offer(individual)
+
+class GeneticSolver(Solver):
+    name = 'genetic'
+
+    def __init__(self, population_size: int = 200, vectorized: bool = None, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.population_size = population_size
+        self.vectorized = vectorized if vectorized is not None else np is not None
+
+    def search(self, game: Game, budget: int) -> None:
+        self.genetic = self.create_genetic(game, self.population_size, vectorized=self.vectorized)
+        termination = Termination(EvaluationBudget(budget), TargetFitness(self.target_fitness))
+        termination.reset(self.genetic)
+        while True:
+            self.genetic.run_generation()
+            self.offer(self.genetic.best())
+            if termination.should_stop(self.genetic, self.best):
+                break
+
+class AnnealingSolver(Solver):
+    # Simulated annealing on a single individual, the neighbours are made by the mutation and repair of Genetic
+    # and scored incrementally by compute_fitness. The fitness spans orders of magnitude during a run, so the
+    # temperature is relative to the current fitness, a move losing the fraction t of it is taken with the
+    # probability 1/e. It falls geometrically with the evaluations used from initial_temperature to final_ratio of it
+    name = 'annealing'
+
+    def __init__(self, initial_temperature: float = 0.1, final_ratio: float = 1e-4, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.initial_temperature = initial_temperature
+        self.final_ratio = final_ratio
+
+    def neighbour(self, individual: Individual) -> Individual:
+        candidate = individual.copy()
+        while self.genetic.mutate(candidate) == NO_MUTATION:
+            pass
+        self.genetic.repair_individual(candidate)
+        self.genetic.compute_fitness(candidate)
+        return candidate
+
+    def search(self, game: Game, budget: int) -> None:
+        self.genetic = self.create_genetic(game, 1)
+        current = self.genetic.population[0]
+        self.genetic.compute_fitness(current)
+        self.offer(current)
+
+        start_evaluations = self.evaluations
+        # neighbours found in the fitness cache do not use the budget, the iterations are bounded as well
+        for _ in range(10 * budget):
+            if self.done(budget):
+                break
+            progress = (self.evaluations - start_evaluations) / max(1, budget - start_evaluations)
+            t = self.initial_temperature * self.final_ratio ** min(1.0, progress)
+            candidate = self.neighbour(current)
+            change = candidate.fitness - current.fitness
+            if change >= 0 or self.genetic._random.random() < math.exp(change / (t * max(1e-9, abs(current.fitness)))):
+                current = candidate
+                self.offer(current)
+
+class VectorCodec:
+    # Maps layouts with one tray per gene to vectors in the unit cube for the continuous optimizers. Each tray
+    # takes dim_x, dim_y, x and y, its layer and orientation when the game has several, scaled to the box.
+    # Decoded vectors are rounded, the z extent follows from the layer
+    def __init__(self, genetic: Genetic) -> None:
+        tables = genetic._tables
+        box_x, box_y, _ = tables.bounding_box
+        self.layer_size_z = tables.layer_size[2]
+        self.gene_count = len(genetic._item_classes)
+        self.params = [DIM_X, DIM_Y, X, Y]
+        low, high = [1, 1, 0, 0], [box_x, box_y, box_x - 1, box_y - 1]
+        if genetic._layers > 1:
+            self.params.append(LAYER)
+            low.append(0)
+            high.append(genetic._layers - 1)
+        if genetic._orientations > 1:
+            self.params.append(ORIENTATION)
+            low.append(0)
+            high.append(genetic._orientations - 1)
+        self.low = np.tile(np.array(low, dtype=np.float64), self.gene_count)
+        self.span = np.maximum(1e-9, np.tile(np.array(high, dtype=np.float64), self.gene_count) - self.low)
+
+    @property
+    def dimension(self) -> int:
+        return len(self.low)
+
+    def decode(self, vectors) -> PopulationArray:
+        values = np.rint(self.low + np.clip(vectors, 0.0, 1.0) * self.span).astype(np.int64)
+        arrays = PopulationArray(len(vectors), self.gene_count, 1)
+        arrays.data[:, :, 0, self.params] = values.reshape(len(vectors), self.gene_count, len(self.params))
+        arrays.data[:, :, 0, DIM_Z] = self.layer_size_z
+        arrays.data[:, :, 0, Z] = arrays.data[:, :, 0, LAYER] * self.layer_size_z
+        arrays.mask[...] = True
+        return arrays
+
+    def encode(self, arrays: PopulationArray):
+        values = arrays.data[:, :, 0, self.params].reshape(arrays.population_size, -1)
+        return np.clip((values - self.low) / self.span, 0.0, 1.0)
+
+class VectorSolver(Solver):
+    # Base of the optimizers over VectorCodec vectors, the candidates of a step are repaired, written back into
+    # their vectors and scored in one batch with compute_fitness_array
+    def search(self, game: Game, budget: int) -> None:
+        if np is None:
+            raise ImportError(f"numpy is required for the {self.name} solver")
+        self.genetic = self.create_genetic(game, 0, max_number_of_elements=1)
+        self.codec = VectorCodec(self.genetic)
+        self.rng = np.random.default_rng(self.seed)
+        self.optimize(budget)
+
+    def evaluate(self, vectors, budget: int):
+        # returns the repaired vectors with their fitness, at most the remaining budget is used
+        vectors = vectors[:max(1, budget - self.evaluations)]
+        arrays = self.codec.decode(vectors)
+        self.genetic.repair_array(arrays)
+        fitness, fitness_ex = self.genetic.compute_fitness_array(arrays)
+        self.offer_array(arrays, fitness, fitness_ex)
+        return self.codec.encode(arrays), fitness
+
+    def optimize(self, budget: int) -> None:
+        raise NotImplementedError
+
+class DifferentialEvolution(VectorSolver):
+    # DE/rand/1/bin, by default with 10 vectors per dimension between 20 and 100
+    name = 'differential_evolution'
+
+    def __init__(self, population_size: int = None, differential_weight: float = 0.5, crossover_rate: float = 0.9,
+                 **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.population_size = population_size
+        self.differential_weight = differential_weight
+        self.crossover_rate = crossover_rate
+
+    def optimize(self, budget: int) -> None:
+        dimension = self.codec.dimension
+        size = self.population_size if self.population_size is not None else min(100, max(20, 10 * dimension))
+        population, fitness = self.evaluate(self.rng.random((size, dimension)), budget)
+        size = len(population)
+        while not self.done(budget) and size >= 4:
+            # three distinct other vectors for every target
+            others = np.argsort(self.rng.random((size, size)) + np.eye(size), axis=1)[:, :3]
+            a, b, c = population[others[:, 0]], population[others[:, 1]], population[others[:, 2]]
+            mutant = np.clip(a + self.differential_weight * (b - c), 0.0, 1.0)
+            crossed = self.rng.random((size, dimension)) < self.crossover_rate
+            crossed[np.arange(size), self.rng.integers(0, dimension, size=size)] = True
+            trial, trial_fitness = self.evaluate(np.where(crossed, mutant, population), budget)
+            rows = np.arange(len(trial))
+            better = trial_fitness >= fitness[rows]
+            population[rows[better]] = trial[better]
+            fitness[rows[better]] = trial_fitness[better]
+
+class CMAES(VectorSolver):
+    # Covariance matrix adaptation evolution strategy with the default parameters of Hansen's tutorial,
+    # maximizing the fitness. The search restarts from the best vector with the initial step size once the
+    # step size has collapsed
+    name = 'cmaes'
+
+    def __init__(self, population_size: int = None, sigma: float = 0.3, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.population_size = population_size
+        self.sigma = sigma
+
+    def optimize(self, budget: int) -> None:
+        n = self.codec.dimension
+        lam = self.population_size if self.population_size is not None else 4 + int(3 * math.log(n))
+        mu = lam // 2
+        weights = math.log(mu + 0.5) - np.log(np.arange(1, mu + 1))
+        weights /= weights.sum()
+        mueff = 1 / (weights ** 2).sum()
+        cc = (4 + mueff / n) / (n + 4 + 2 * mueff / n)
+        cs = (mueff + 2) / (n + mueff + 5)
+        c1 = 2 / ((n + 1.3) ** 2 + mueff)
+        cmu = min(1 - c1, 2 * (mueff - 2 + 1 / mueff) / ((n + 2) ** 2 + mueff))
+        damps = 1 + 2 * max(0.0, math.sqrt((mueff - 1) / (n + 1)) - 1) + cs
+        chi_n = math.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n ** 2))
+
+        mean = self.rng.random(n)
+        while not self.done(budget):
+            sigma = self.sigma
+            covariance = np.eye(n)
+            pc, ps = np.zeros(n), np.zeros(n)
+            generation = 0
+            while not self.done(budget):
+                eigenvalues, basis = np.linalg.eigh(covariance)
+                scales = np.sqrt(np.maximum(eigenvalues, 1e-20))
+                if sigma * scales.max() < 1e-4:
+                    break
+                samples = mean + sigma * (self.rng.standard_normal((lam, n)) * scales) @ basis.T
+                vectors, fitness = self.evaluate(samples, budget)
+                order = np.argsort(-fitness, kind='stable')[:mu]
+                if len(order) < mu:
+                    break
+                steps = (vectors[order] - mean) / sigma
+                old_mean = mean
+                mean = old_mean + sigma * weights @ steps
+                step = (mean - old_mean) / sigma
+
+                ps = (1 - cs) * ps + math.sqrt(cs * (2 - cs) * mueff) * (basis @ ((basis.T @ step) / scales))
+                generation += 1
+                hsig = (np.linalg.norm(ps) / math.sqrt(1 - (1 - cs) ** (2 * generation)) / chi_n) < 1.4 + 2 / (n + 1)
+                pc = (1 - cc) * pc + hsig * math.sqrt(cc * (2 - cc) * mueff) * step
+                covariance = ((1 - c1 - cmu) * covariance
+                              + c1 * (np.outer(pc, pc) + (1 - hsig) * cc * (2 - cc) * covariance)
+                              + cmu * (steps.T * weights) @ steps)
+                covariance = (covariance + covariance.T) / 2
+                sigma *= math.exp((cs / damps) * (np.linalg.norm(ps) / chi_n - 1))
+            mean = self.codec.encode(self.genetic.to_array([self.best]))[0]
+
+SOLVERS = {solver.name: solver for solver in (GeneticSolver, AnnealingSolver, DifferentialEvolution, CMAES)}
+
+def create_solver(name: str, **kwargs) -> Solver:
+    if name not in SOLVERS:
+        raise ValueError(f"Unknown solver {name}, expected one of {tuple(SOLVERS)}")
+    return SOLVERS[name](**kwargs)
+
+def solve(game: Game, budget: int, solver: str = 'genetic', **kwargs) -> List[dict]:
+    return create_solver(solver, **kwargs).solve(game, budget)
@@ -0,0 +1,123 @@
+import time
+
+# Stopping rules shared by the drivers of the solver. A driver resets its termination once before the
+# run and asks it after every step whether to stop, the solver passed in provides generation,
+# evaluations and diversity(), best is the best individual found so far
+
+class Criterion:
+    def reset(self, solver) -> None:
+        pass
+
+    def should_stop(self, solver, best) -> bool:
+        raise NotImplementedError
+
+class MaxGenerations(Criterion):
+    def __init__(self, generations: int) -> None:
+        self.generations = generations
+
+    def reset(self, solver) -> None:
+        self._start = solver.generation
+
+    def should_stop(self, solver, best) -> bool:
+        return solver.generation - self._start >= self.generations
+
+    def __repr__(self) -> str:
+        return f"MaxGenerations({self.generations})"
+
+class Stagnation(Criterion):
+    def __init__(self, window: int = 100, tolerance: float = 1e-9) -> None:
+        # stop when the best fitness did not improve by more than tolerance for window generations
+        self.window = window
+        self.tolerance = tolerance
+
+    def reset(self, solver) -> None:
+        self._best = None
+        self._since = solver.generation
+
+    def should_stop(self, solver, best) -> bool:
+        if self._best is None or best.fitness > self._best + self.tolerance:
+            self._best = best.fitness
+            self._since = solver.generation
+            return False
+        return solver.generation - self._since >= self.window
+
+    def __repr__(self) -> str:
+        return f"Stagnation({self.window}, {self.tolerance})"
+
+class WallClock(Criterion):
+    def __init__(self, seconds: float) -> None:
+        self.seconds = seconds
+
+    def reset(self, solver) -> None:
+        self._deadline = time.perf_counter() + self.seconds
+
+    def should_stop(self, solver, best) -> bool:
+        return time.perf_counter() >= self._deadline
+
+    def __repr__(self) -> str:
+        return f"WallClock({self.seconds})"
+
+class EvaluationBudget(Criterion):
+    def __init__(self, evaluations: int) -> None:
+        self.evaluations = evaluations
+
+    def reset(self, solver) -> None:
+        self._start = solver.evaluations
+
+    def should_stop(self, solver, best) -> bool:
+        return solver.evaluations - self._start >= self.evaluations
+
+    def __repr__(self) -> str:
+        return f"EvaluationBudget({self.evaluations})"
+
+class TargetFitness(Criterion):
+    def __init__(self, target: float = 0.0) -> None:
+        self.target = target
+
+    def should_stop(self, solver, best) -> bool:
+        return best.fitness >= self.target
+
+    def __repr__(self) -> str:
+        return f"TargetFitness({self.target})"
+
+class DiversityCollapse(Criterion):
+    def __init__(self, threshold: float = 1e-3, interval: int = 10) -> None:
+        # stop once the population diversity falls below threshold, measured every interval generations
+        self.threshold = threshold
+        self.interval = interval
+
+    def reset(self, solver) -> None:
+        self._next = solver.generation + self.interval
+
+    def should_stop(self, solver, best) -> bool:
+        if solver.generation < self._next:
+            return False
+        self._next = solver.generation + self.interval
+        return solver.diversity() < self.threshold
+
+    def __repr__(self) -> str:
+        return f"DiversityCollapse({self.threshold}, {self.interval})"
+
+class Termination(Criterion):
+    # Stops as soon as any of its criteria does, reason holds the criterion that stopped the run
+    def __init__(self, *criteria: Criterion) -> None:
+        self.criteria = list(criteria)
+        self.reason: Criterion = None
+
+    def reset(self, solver) -> None:
+        self.reason = None
+        for criterion in self.criteria:
+            criterion.reset(solver)
+
+    def should_stop(self, solver, best) -> bool:
+        for criterion in self.criteria:
+            if criterion.should_stop(solver, best):
+                self.reason = criterion.reason if isinstance(criterion, Termination) else criterion
+                return True
+        return False
+
+    def __repr__(self) -> str:
+        return f"Termination({', '.join(map(repr, self.criteria))})"
+
+def default_termination(generations: int = 3000, window: int = 100) -> Termination:
+    return Termination(MaxGenerations(generations), Stagnation(window), TargetFitness(0.0))
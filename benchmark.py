@@ -0,0 +1,243 @@
+# Benchmark runner for the Genetic solver
+#
+# Runs seeded scenarios of increasing size and reports generations/s, fitness evaluations/s,
+# time to reach the target fitness and peak memory, e.g.
+#   python benchmark.py --output results.json
+#   python benchmark.py --scenarios etherfields many_classes --compare results.json
+# The backends of Solvers are compared on the same scenarios with a budget of fitness evaluations, e.g.
+#   python benchmark.py --modes --solvers genetic annealing differential_evolution cmaes --budget 20000
+# The batched scoring of object-mode populations is compared with scoring the individuals one by one, e.g.
+#   python benchmark.py --modes --fitness
+# Scoring a population of fresh children in one batch, including the conversion to arrays, measured x4-5 for
+# cards, x4-7 for etherfields, x7-8 for many_classes and x3-4 for multi_element with 3 elements per gene
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+from typing import Callable, List
+
+try:
+    from .Game import Game, Card, cards_game, etherfields_game
+    from .Genetic import Genetic, np
+    from .Solvers import Solver, VectorSolver, SOLVERS, create_solver
+except:
+    from Game import Game, Card, cards_game, etherfields_game
+    from Genetic import Genetic, np
+    from Solvers import Solver, VectorSolver, SOLVERS, create_solver
+
+class Scenario:
+    def __init__(self, name: str, create_game: Callable[[], Game], population_size: int, generations: int,
+                 target_fitness: float, factors=(0, 0.1, 1, 1, 1), max_number_of_elements: int = 1) -> None:
+        self.name = name
+        self.create_game = create_game
+        self.population_size = population_size
+        self.generations = generations
+        self.target_fitness = target_fitness
+        self.factors = factors
+        self.max_number_of_elements = max_number_of_elements
+
+    def create_genetic(self, seed: int, vectorized: bool) -> Genetic:
+        return Genetic(self.create_game(), self.population_size, *self.factors, vectorized=vectorized,
+                       max_number_of_elements=self.max_number_of_elements, seed=seed)
+
+    def create_solver(self, name: str, seed: int) -> Solver:
+        kwargs = {'max_number_of_elements': self.max_number_of_elements} if self.max_number_of_elements > 1 else {}
+        return create_solver(name, factors=self.factors, seed=seed, target_fitness=self.target_fitness, **kwargs)
+
+def many_classes_game() -> Game:
+    game = Game(300, 300, 120)
+    for i in range(8):
+        game.add_items(Card(60 + 6 * i, 40 + 4 * i, 1), 20 + 5 * i)
+    return game
+
+SCENARIOS = {
+    'cards': Scenario('cards', cards_game, 100, 200, -0.5),
+    'etherfields': Scenario('etherfields', etherfields_game, 200, 300, -0.5),
+    'many_classes': Scenario('many_classes', many_classes_game, 200, 200, -5.0),
+    'multi_element': Scenario('multi_element', etherfields_game, 200, 200, -1.0, max_number_of_elements=3),
+}
+
+def run_scenario(scenario: Scenario, seed: int, vectorized: bool, generations: int = None,
+                 memory_generations: int = 10) -> dict:
+    generations = generations if generations is not None else scenario.generations
+    genetic = scenario.create_genetic(seed, vectorized)
+    evaluations = genetic.evaluations
+    time_to_target = None
+    generations_to_target = None
+
+    start = time.perf_counter()
+    for i in range(generations):
+        genetic.run_generation()
+        winner = genetic.best()
+        if time_to_target is None and winner.fitness >= scenario.target_fitness:
+            time_to_target = time.perf_counter() - start
+            generations_to_target = i + 1
+    elapsed = time.perf_counter() - start
+    evaluations = genetic.evaluations - evaluations
+
+    # memory is traced in a separate short run, tracing slows the solver down too much to time it
+    tracemalloc.start()
+    genetic = scenario.create_genetic(seed, vectorized)
+    for _ in range(min(generations, memory_generations)):
+        genetic.run_generation()
+        genetic.best()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'scenario': scenario.name,
+        'mode': 'vectorized' if vectorized else 'object',
+        'seed': seed,
+        'generations': generations,
+        'elapsed': elapsed,
+        'generations_per_second': generations / elapsed,
+        'evaluations': evaluations,
+        'evaluations_per_second': evaluations / elapsed,
+        'best_fitness': winner.fitness,
+        'target_fitness': scenario.target_fitness,
+        'time_to_target': time_to_target,
+        'generations_to_target': generations_to_target,
+        'peak_memory': peak_memory,
+    }
+
+def run_solver(scenario: Scenario, name: str, seed: int, budget: int) -> dict:
+    # the solvers stop at the target fitness, so the evaluations used measure how fast they reach it
+    solver = scenario.create_solver(name, seed)
+    tracemalloc.start()
+    solver.solve(scenario.create_game(), budget)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # memory is traced in the same run, the times are slower than in the Genetic scenarios
+    return {
+        'scenario': scenario.name,
+        'mode': name,
+        'seed': seed,
+        'budget': budget,
+        'elapsed': solver.elapsed,
+        'evaluations': solver.evaluations,
+        'evaluations_per_second': solver.evaluations / solver.elapsed,
+        'best_fitness': solver.best.fitness,
+        'target_fitness': scenario.target_fitness,
+        'time_to_target': solver.time_to_target,
+        'peak_memory': peak_memory,
+    }
+
+def run_fitness(scenario: Scenario, seed: int, generations: int = 3, repeats: int = 20) -> dict:
+    # Times Genetic.evaluate_population against compute_fitness on every individual of a population of fresh
+    # children, both without the fitness cache. The best of the repeats is kept
+    genetic = scenario.create_genetic(seed, False)
+    for _ in range(generations):
+        genetic.run_generation()
+    children = []
+    for individual in genetic.population:
+        child = individual.copy()
+        genetic.mutate(child)
+        genetic.repair_individual(child)
+        children.append(child)
+
+    def timed(score) -> float:
+        best = None
+        for _ in range(repeats):
+            individuals = [child.copy() for child in children]
+            for individual in individuals:
+                individual.mark_dirty()
+            genetic.fitness_cache.clear()
+            start = time.perf_counter()
+            score(individuals)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    single = timed(lambda individuals: [genetic.compute_fitness(individual) for individual in individuals])
+    batched = timed(genetic.evaluate_population)
+    return {
+        'scenario': scenario.name,
+        'mode': 'fitness',
+        'seed': seed,
+        'individuals': len(children),
+        'single': single,
+        'batched': batched,
+        'speedup': single / batched,
+    }
+
+def compare(results: List[dict], baseline: List[dict]) -> None:
+    # ratios above 1 are improvements over the baseline, solver runs are compared by evaluations/s
+    previous = {(r['scenario'], r['mode']): r for r in baseline}
+    for result in results:
+        old = previous.get((result['scenario'], result['mode']))
+        if old is None:
+            continue
+        if result['mode'] == 'fitness':
+            print(f"{result['scenario']:>14} {result['mode']:>10}: speedup x{old['speedup']:.2f} -> x{result['speedup']:.2f}")
+            continue
+        rate = 'generations_per_second' if 'generations_per_second' in result else 'evaluations_per_second'
+        speedup = result[rate] / old[rate]
+        memory = old['peak_memory'] / max(1, result['peak_memory'])
+        print(f"{result['scenario']:>14} {result['mode']:>10}: {rate.split('_')[0]}/s x{speedup:.2f}, memory x{memory:.2f}, "
+              f"fitness {old['best_fitness']:.4f} -> {result['best_fitness']:.4f}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark the Genetic solver')
+    parser.add_argument('--scenarios', nargs='*', default=list(SCENARIOS.keys()), choices=list(SCENARIOS.keys()))
+    parser.add_argument('--modes', nargs='*', default=['object', 'vectorized'], choices=['object', 'vectorized'])
+    parser.add_argument('--solvers', nargs='*', default=[], choices=list(SOLVERS.keys()))
+    parser.add_argument('--fitness', action='store_true', help='time the batched scoring of object-mode populations')
+    parser.add_argument('--budget', type=int, default=20000, help='fitness evaluations of every solver run')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--generations', type=int, default=None, help='override the generations of every scenario')
+    parser.add_argument('--output', default=None, help='write the results to this JSON file')
+    parser.add_argument('--compare', default=None, help='JSON file of an earlier run to compare against')
+    args = parser.parse_args()
+
+    results = []
+    for name in args.scenarios:
+        for mode in args.modes:
+            if mode == 'vectorized' and np is None:
+                print(f"{name}: skipping vectorized mode, numpy is not installed")
+                continue
+            result = run_scenario(SCENARIOS[name], args.seed, mode == 'vectorized', args.generations)
+            results.append(result)
+            print(f"{name:>14} {mode:>10}: {result['generations_per_second']:8.1f} generations/s "
+                  f"{result['evaluations_per_second']:10.1f} evaluations/s "
+                  f"target {result['time_to_target']} s, peak memory {result['peak_memory'] / 1e6:.1f} MB, "
+                  f"best fitness {result['best_fitness']:.4f}")
+        for solver in args.solvers:
+            if issubclass(SOLVERS[solver], VectorSolver):
+                # the vector backends place one tray per gene
+                if np is None:
+                    print(f"{name}: skipping {solver}, numpy is not installed")
+                    continue
+                if SCENARIOS[name].max_number_of_elements > 1:
+                    print(f"{name}: skipping {solver}, it places a single tray per gene")
+                    continue
+            result = run_solver(SCENARIOS[name], solver, args.seed, args.budget)
+            results.append(result)
+            print(f"{name:>14} {solver:>10}: {result['evaluations']:8d} evaluations "
+                  f"{result['evaluations_per_second']:10.1f} evaluations/s "
+                  f"target {result['time_to_target']} s, peak memory {result['peak_memory'] / 1e6:.1f} MB, "
+                  f"best fitness {result['best_fitness']:.4f}")
+        if args.fitness:
+            if np is None:
+                print(f"{name}: skipping the fitness timing, numpy is not installed")
+                continue
+            result = run_fitness(SCENARIOS[name], args.seed)
+            results.append(result)
+            print(f"{name:>14} {'fitness':>10}: {result['individuals']} individuals one by one {result['single'] * 1e3:.2f} ms, "
+                  f"batched {result['batched'] * 1e3:.2f} ms, x{result['speedup']:.1f}")
+
+    report = {
+        'python': platform.python_version(),
+        'numpy': np.__version__ if np is not None else None,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare is not None:
+        with open(args.compare) as f:
+            compare(results, json.load(f)['results'])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+import pytest
+
+from Adaptation import OperatorAdaptation
+from Checkpoint import save_checkpoint, load_checkpoint
+from Game import etherfields_game
+from Genetic import Genetic
+from Termination import Termination, MaxGenerations
+
+GENERATIONS = 20
+
+def create_genetic(vectorized: bool, adaptation: bool) -> Genetic:
+    return Genetic(etherfields_game(), 40, 0, 0.1, 1, 1, 1, vectorized=vectorized, seed=1,
+                   adaptation=OperatorAdaptation() if adaptation else None)
+
+@pytest.mark.parametrize('vectorized', [False, True])
+@pytest.mark.parametrize('adaptation', [False, True])
+def test_resumed_run_matches_straight_run(tmp_path, vectorized, adaptation):
+    straight = create_genetic(vectorized, adaptation)
+    winner = straight.run(Termination(MaxGenerations(GENERATIONS)), report_interval=0)
+
+    path = str(tmp_path / 'run.checkpoint')
+    first = create_genetic(vectorized, adaptation)
+    first.run(Termination(MaxGenerations(GENERATIONS // 2)), report_interval=0)
+    save_checkpoint(first, path)
+    resumed = create_genetic(vectorized, adaptation)
+    load_checkpoint(resumed, path)
+    resumed_winner = resumed.run(Termination(MaxGenerations(GENERATIONS // 2)), report_interval=0)
+
+    assert resumed.generation == straight.generation
+    assert resumed_winner.genome() == winner.genome()
+    assert resumed_winner.fitness == winner.fitness
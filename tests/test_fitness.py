@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from Game import Game, Card
+from Genetic import Genetic
+
+def random_game(rng: random.Random) -> Game:
+    game = Game(rng.randint(80, 300), rng.randint(80, 300), rng.randint(40, 130))
+    for _ in range(rng.randint(1, 6)):
+        game.add_items(Card(rng.randint(20, 120), rng.randint(20, 120), rng.randint(1, 3)), rng.randint(5, 60))
+    return game
+
+def random_genetic(seed: int) -> Genetic:
+    rng = random.Random(seed)
+    factors = [rng.choice([0, 0.1, 1]), rng.choice([0.1, 1]), rng.uniform(0, 2), rng.uniform(0, 2), rng.uniform(0, 2)]
+    genetic = Genetic(random_game(rng), 30, *factors, seed=seed, max_number_of_elements=rng.randint(1, 3),
+                      layers=rng.randint(1, 3), orientations=rng.randint(1, 2), repair_collisions=rng.random() < 0.5)
+    for individual in genetic.population:
+        for _ in range(rng.randint(0, 6)):
+            genetic.mutate(individual)
+        genetic.repair_individual(individual)
+    return genetic
+
+def scores(individuals) -> list:
+    return [(individual.fitness, tuple(individual.fitness_ex)) for individual in individuals]
+
+def assert_same_scores(genetic: Genetic) -> None:
+    # every individual is scored one by one, in one batch and as an array from the same dirty state
+    single = [individual.copy() for individual in genetic.population]
+    batched = [individual.copy() for individual in genetic.population]
+    genetic.fitness_cache.clear()
+    for individual in single:
+        genetic.compute_fitness(individual)
+    genetic.fitness_cache.clear()
+    genetic.evaluate_population(batched)
+    fitness, fitness_ex = genetic.compute_fitness_array(genetic.to_array(genetic.population))
+    arrays = [(f, tuple(ex)) for f, ex in zip(fitness.tolist(), fitness_ex.tolist())]
+    assert scores(single) == scores(batched) == arrays
+
+@pytest.mark.parametrize('seed', range(40))
+def test_batched_fitness_matches_single_fitness(seed):
+    genetic = random_genetic(seed)
+    assert_same_scores(genetic)
+
+@pytest.mark.parametrize('seed', range(20))
+def test_incremental_fitness_matches_batched_fitness(seed):
+    # the second round scores children with a few changed genes from the terms of their parents
+    genetic = random_genetic(seed)
+    for individual in genetic.population:
+        genetic.compute_fitness(individual)
+    children = []
+    for individual in genetic.population:
+        child = individual.copy()
+        genetic.mutate(child)
+        genetic.repair_individual(child)
+        children.append(child)
+    genetic.population = children
+    assert_same_scores(genetic)
@@ -0,0 +1,27 @@
+import random
+
+import pytest
+
+from Game import etherfields_game
+from Genetic import Genetic
+
+def run(genetic: Genetic, generations: int, other: Genetic = None) -> tuple:
+    for _ in range(generations):
+        genetic.run_generation()
+        if other is not None:
+            other.run_generation()
+            random.random()
+    return genetic.best().genome()
+
+@pytest.mark.parametrize('vectorized', [False, True])
+def test_seeded_runs_do_not_affect_each_other(vectorized):
+    alone = run(Genetic(etherfields_game(), 40, 0, 0.1, 1, 1, 1, vectorized=vectorized, seed=1), 5)
+    other = Genetic(etherfields_game(), 40, 0, 0.1, 1, 1, 1, vectorized=vectorized, seed=2)
+    interleaved = run(Genetic(etherfields_game(), 40, 0, 0.1, 1, 1, 1, vectorized=vectorized, seed=1), 5, other)
+    assert alone == interleaved
+
+def test_seed_leaves_random_module_alone():
+    random.seed(7)
+    state = random.getstate()
+    run(Genetic(etherfields_game(), 40, 0, 0.1, 1, 1, 1, seed=1), 3)
+    assert random.getstate() == state
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from Game import etherfields_game
+from Genetic import Genetic
+from Parallel import FitnessPool
+from PopulationArray import PopulationArray
+from Termination import Termination, MaxGenerations
+
+@pytest.mark.parametrize('vectorized', [False, True])
+@pytest.mark.parametrize('shared', [False, True])
+def test_pool_scores_every_generation(vectorized, shared):
+    genetic = Genetic(etherfields_game(), 60, 0, 0.1, 1, 1, 1, vectorized=vectorized, seed=1)
+    scored = []
+    with FitnessPool(genetic, workers=2, shared=shared) as pool:
+        evaluate_array = pool.evaluate_array
+        def counted(arrays, rows=None):
+            fitness, fitness_ex = evaluate_array(arrays, rows)
+            scored.append(len(fitness))
+            return fitness, fitness_ex
+        pool.evaluate_array = counted
+        genetic.run(Termination(MaxGenerations(5)), pool, report_interval=0)
+    assert sum(scored) == genetic.evaluations
+
+def test_shared_pool_keeps_population_intact():
+    genetic = Genetic(etherfields_game(), 40, 0, 0.1, 1, 1, 1, vectorized=True, seed=1)
+    other = Genetic(etherfields_game(), 80, 0, 0.1, 1, 1, 1, vectorized=True, seed=2)
+    with FitnessPool(genetic, workers=2, shared=True) as pool:
+        genetic.run_generation(pool)
+        population = genetic._arrays
+        records = population.data.copy()
+        expected = genetic.compute_fitness_array(other._arrays)
+        # batches that are not the population, of the same and of a larger size, leave it untouched
+        for arrays in (other._arrays.take(slice(0, 40)), other._arrays):
+            fitness, fitness_ex = pool.evaluate_array(arrays)
+            np.testing.assert_array_equal(fitness, expected[0][:arrays.population_size])
+        np.testing.assert_array_equal(population.data, records)
+        # a larger population moves to a new block, the old population stays readable
+        genetic._arrays = pool.share(PopulationArray.concatenate([population, population]))
+        np.testing.assert_array_equal(population.data, records)
+        shared = genetic._arrays
+    # closing the pool keeps the arrays on its blocks readable
+    np.testing.assert_array_equal(shared.data[:40], records)
+    np.testing.assert_array_equal(population.data, records)
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from Game import etherfields_game
+from Parallel import FitnessPool
+from Pareto import NSGA2, non_dominated_sort
+
+def test_non_dominated_sort_matches_dominance():
+    objectives = np.random.default_rng(0).integers(0, 5, size=(100, 3)).astype(float)
+    ranks = np.empty(len(objectives), dtype=int)
+    for rank, front in enumerate(non_dominated_sort(objectives)):
+        ranks[front] = rank
+    for i in range(len(objectives)):
+        for j in range(len(objectives)):
+            if (objectives[i] <= objectives[j]).all() and (objectives[i] < objectives[j]).any():
+                assert ranks[i] < ranks[j]
+
+@pytest.mark.parametrize('shared', [False, True])
+def test_stored_fitness_matches_population_with_pool(shared):
+    search = NSGA2(etherfields_game(), 40, seed=1)
+    genetic = search.genetic
+    with FitnessPool(genetic, workers=2, shared=shared) as pool:
+        for _ in range(3):
+            search.run_generation(pool)
+            fitness, fitness_ex = genetic.compute_fitness_array(genetic._arrays)
+            np.testing.assert_array_equal(fitness, genetic._fitness)
+            np.testing.assert_array_equal(fitness_ex, genetic._fitness_ex)
@@ -0,0 +1,29 @@
+import random
+
+import pytest
+
+from Game import Game, Card
+from Genetic import Genetic
+
+def unrepaired_genetic(seed: int, repair_collisions: bool) -> Genetic:
+    rng = random.Random(seed)
+    game = Game(rng.randint(80, 300), rng.randint(80, 300), rng.randint(40, 130))
+    for _ in range(rng.randint(1, 6)):
+        game.add_items(Card(rng.randint(20, 120), rng.randint(20, 120), rng.randint(1, 3)), rng.randint(5, 60))
+    genetic = Genetic(game, 30, 0, 0.1, 1, 1, 1, seed=seed, max_number_of_elements=rng.randint(1, 3),
+                      layers=rng.randint(1, 3), orientations=rng.randint(1, 2), repair_collisions=repair_collisions)
+    genetic.mutation_step = rng.choice([10, 100])
+    for individual in genetic.population:
+        for _ in range(rng.randint(1, 8)):
+            genetic.mutate(individual)
+    return genetic
+
+@pytest.mark.parametrize('seed', range(20))
+@pytest.mark.parametrize('repair_collisions', [False, True])
+def test_array_repair_matches_object_repair(seed, repair_collisions):
+    genetic = unrepaired_genetic(seed, repair_collisions)
+    arrays = genetic.to_array(genetic.population)
+    genetic.repair_array(arrays)
+    for i, individual in enumerate(genetic.population):
+        genetic.repair_individual(individual)
+        assert arrays.to_records(i) == individual.genome()
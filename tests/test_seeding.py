@@ -0,0 +1,22 @@
+import pytest
+
+from Game import etherfields_game
+from Genetic import Genetic, individual_to_trays
+from Packer import pack
+
+@pytest.mark.parametrize('vectorized', [False, True])
+def test_warm_start_keeps_packed_seeds(vectorized):
+    earlier = Genetic(etherfields_game(), 20, 0, 0.1, 1, 1, 1, seed=2)
+    layout = individual_to_trays(earlier.population[0])
+
+    genetic = Genetic(etherfields_game(), 100, 0, 0.1, 1, 1, 1, vectorized=vectorized, seed=1)
+    packed = pack(genetic._game, genetic._max_number_of_elements, genetic._layers)
+    genetic.repair_individual(packed)
+    warm = genetic.individual_from_trays(layout)
+
+    genetic.pack_start(0.1)
+    genetic.warm_start([layout], 0.5)
+    population = genetic.population
+    assert population[0].genome() == packed.genome()
+    assert population[10].genome() == warm.genome()
+    assert genetic._seeded == 60